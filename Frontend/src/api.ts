@@ -1,8 +1,49 @@
-import axios from 'axios'
+import axios, { AxiosRequestConfig } from 'axios'
 
 const api = axios.create({
   baseURL: '/api',
   withCredentials: true,
 });
 
+/**
+ * POSTs through `api` and hands each line of an NDJSON response to `onMessage` as it
+ * arrives. The fetch adapter exposes the body as a stream; the base URL, credentials
+ * and error shape (error.response.status and .data) are the same as for any other call.
+ */
+export async function postNdjson(url: string, body: unknown, onMessage: (message: any) => void, config: AxiosRequestConfig = {}) {
+  let response;
+  try {
+    response = await api.post(url, body, {
+      ...config,
+      adapter: 'fetch',
+      responseType: 'stream',
+      headers: { ...config.headers, Accept: 'application/x-ndjson' },
+    });
+  } catch (error) {
+    // Error bodies arrive as a stream too; decode them so callers can read response.data.error
+    if (axios.isAxiosError(error) && error.response?.data instanceof ReadableStream) {
+      const text = await new Response(error.response.data).text();
+      try {
+        error.response.data = JSON.parse(text);
+      } catch {
+        error.response.data = { error: text };
+      }
+    }
+    throw error;
+  }
+
+  const reader = (response.data as ReadableStream<Uint8Array>).getReader();
+  const decoder = new TextDecoder();
+  let pending = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    pending += decoder.decode(value, { stream: true });
+    const lines = pending.split('\n');
+    pending = lines.pop() ?? '';
+    lines.filter((line) => line.trim()).forEach((line) => onMessage(JSON.parse(line)));
+  }
+  if (pending.trim()) onMessage(JSON.parse(pending));
+}
+
 export default api;
@@ -7,14 +7,15 @@ import { Separator } from "@/components/ui/separator";
 import { Dialog, DialogContent, DialogDescription, DialogFooter, DialogHeader, DialogTitle } from "@/components/ui/dialog";
 import { ScrollArea } from "@/components/ui/scroll-area";
 import { Accordion, AccordionContent, AccordionItem, AccordionTrigger } from "@/components/ui/accordion";
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { Upload, FileText, Download, CheckCircle, Clock, AlertCircle, Eye, X, ChevronDown, ChevronUp, Sun, Moon } from "lucide-react";
 import { Collapsible, CollapsibleContent, CollapsibleTrigger } from "./ui/collapsible";
-import api from "@/api";
+import api, { postNdjson } from "@/api";
 import { FileUpload } from "./FileUpload";
 import { toast } from "sonner";
 import { useTheme } from "./ui/theme-provider";
 import { Input } from "./ui/input";
+import { CHUNKED_UPLOAD_THRESHOLD, chunkedUpload } from "@/lib/chunkedUpload";
 
 const Dashboard = () => {
   const [conversionStatus, setConversionStatus] = useState<'idle' | 'processing' | 'complete' | 'error'>('idle');
@@ -25,30 +26,75 @@ const Dashboard = () => {
   const [previewData, setPreviewData] = useState<any[]>([]);
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [isExpanded, setIsExpanded] = useState(false);
+  const [validation, setValidation] = useState<any | null>(null);
   const { theme, setTheme } = useTheme();
   const inCanvas = (window as any).CANVAS_COURSE_ID;
 
   const errorCount = previewData.filter((q) => q.type === 'error').length;
 
+  // Live syntax feedback while typing; /validate returns only counts and error locations
+  useEffect(() => {
+    if (!quizContent.trim()) {
+      setValidation(null);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      api.post('/validate', { quiz_text: quizContent }, { signal: controller.signal })
+        .then((res) => setValidation(res.data))
+        .catch(() => { /* Superseded or server busy: keep the last result */ });
+    }, 400);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [quizContent]);
+
   const handleFileUpload = (file: File) => {
     setSelectedFile(file);
   };
 
+  // Streams /preview as NDJSON so the bar follows the real work: PDF pages extracted, then blocks parsed
   const parseQuestions = async (content: string | null, file: File | null) => {
     if (!content && !file) return [];
-    let response;
-
-    if (file) {
+    let body: FormData | { file_id: string } | { quiz_text: string | null };
+    let base = 0; // Share of the bar taken by a chunked upload
+
+    if (file && file.size > CHUNKED_UPLOAD_THRESHOLD) {
+      // Large files go up in resumable parts, so a dropped connection does not restart from zero
+      const fileId = await chunkedUpload(file, (fraction) => setProgress(fraction * 40));
+      base = 40;
+      body = { file_id: fileId };
+    } else if (file) {
       const formData = new FormData();
       formData.append('file', file);
-      response = await api.post('/preview', formData);
-    } else if (content) {
-      response = await api.post('/preview', { quiz_text: content }, {
-        headers: { 'Content-Type': 'application/json' }
-      });
+      body = formData;
+    } else {
+      body = { quiz_text: content };
     }
 
-    return response?.data?.questions ?? [];
+    const questions: any[] = [];
+    let parseStart = base; // Extraction, when there is any, fills the first half of what is left
+    let blockTotal = 0;
+    const handleLine = (message: any) => {
+      if (message.progress) {
+        const { stage, done, total } = message.progress;
+        if (stage === 'extracting') {
+          parseStart = base + (100 - base) / 2;
+          setProgress(base + (total ? (done / total) * (parseStart - base) : 0));
+        } else if (stage === 'parsing') {
+          blockTotal = total;
+        }
+      } else if (message.question) {
+        questions.push(message.question);
+        if (blockTotal) setProgress(parseStart + (questions.length / blockTotal) * (100 - parseStart));
+      } else if (message.error) {
+        throw new Error(message.error);
+      }
+    };
+
+    await postNdjson('/preview', body, handleLine);
+    return questions;
   };
 
   const handleConvert = async () => {
@@ -60,24 +106,23 @@ const Dashboard = () => {
       setConversionStatus('error');
       return;
     }
-    // Simulate conversion progress
-    const interval = setInterval(() => {
-      setProgress(prev => {
-        if (prev >= 100) {
-          clearInterval(interval);
-          setConversionStatus('complete');
-          // Parse questions and show preview
-          (async () => {
-            const parsed = await parseQuestions(quizContent ? quizContent : null, selectedFile ? selectedFile : null);
-            setPreviewData(parsed);
-            toast.success("Questions parsed successfully!");
-            setShowPreview(true);
-          })();
-          return 100;
-        }
-        return prev + 10;
-      });
-    }, 200);
+
+    try {
+      const parsed = await parseQuestions(quizContent ? quizContent : null, selectedFile ? selectedFile : null);
+      setPreviewData(parsed);
+      setProgress(100);
+      setConversionStatus('complete');
+      toast.success("Questions parsed successfully!");
+      setShowPreview(true);
+    } catch (err: any) {
+      console.error("Preview Error:", err);
+      setConversionStatus('error');
+      if (err.response && err.response.status === 401) {
+        toast.error("Not authorized. Please close and relaunch the tool from Canvas.");
+        return;
+      }
+      toast.error(`Preview failed: ${err.response?.data?.error || err.message}`);
+    }
   };
 
   const handleFinalExport = (type: 'qti' | 'canvas') => {
@@ -89,7 +134,11 @@ const Dashboard = () => {
       try {
         if (type === 'qti') {
           let response;
-          if (selectedFile) {
+          if (selectedFile && selectedFile.size > CHUNKED_UPLOAD_THRESHOLD) {
+            // Already uploaded for the preview, so this only confirms the upload and returns its id
+            const fileId = await chunkedUpload(selectedFile);
+            response = await api.post('/download', { quiz_title: quizTitle, file_id: fileId }, { responseType: 'blob' });
+          } else if (selectedFile) {
             const formData = new FormData();
             formData.append('quiz_title', quizTitle);
             formData.append('file', selectedFile);
@@ -142,7 +191,30 @@ const Dashboard = () => {
             throw error; // Re-throw if it wasn't a 401
           }
 
-          const progressUrl = response?.data?.progress_url;
+          // The server queues the Canvas push as a background job; wait for it to hand back a progress URL
+          let progressUrl = response?.data?.progress_url;
+          const statusUrl = response?.data?.job_id ? `/jobs/${response.data.job_id}` : null;
+          const MAX_JOB_POLL_ATTEMPTS = 120;
+          let jobPollAttempts = 0;
+          while (!progressUrl && statusUrl && jobPollAttempts < MAX_JOB_POLL_ATTEMPTS) {
+            jobPollAttempts++;
+            await new Promise(r => setTimeout(r, 1000));
+            const jobRes = await api.get(statusUrl);
+            const job = jobRes.data;
+            if (job.status === 'failed') {
+              if (job.status_code === 401) {
+                toast.error("Not authorized. Please close and relaunch the tool from Canvas.");
+                setConversionStatus('error');
+                return;
+              }
+              throw new Error(job.error || "Canvas upload failed");
+            }
+            if (job.status === 'succeeded') {
+              progressUrl = job.result?.progress_url;
+              break;
+            }
+            setProgress(Math.min(25, 10 + jobPollAttempts));
+          }
           if (!progressUrl) {
             throw new Error("No progress URL returned from Canvas");
           }
@@ -150,21 +222,48 @@ const Dashboard = () => {
           toast.success("Upload initiated! Processing...");
           setProgress(30);
 
+          const applyProgress = (data: any) => {
+            const rawCompletion = data.completion;
+            const completion = typeof rawCompletion === 'number' && rawCompletion >= 0 && rawCompletion <= 100
+              ? rawCompletion
+              : 0;
+            setProgress(30 + (completion * 0.7)); // Scale 0-100 to 30-100%
+            return data.workflow_state;
+          };
+
+          // Prefer the server-pushed stream; a single server-side poller is shared by every open tab
+          let finalState: string | null = null;
+          try {
+            finalState = await new Promise<string>((resolve, reject) => {
+              const source = new EventSource(`/api/progress/stream?url=${encodeURIComponent(progressUrl as string)}`);
+              source.onmessage = (event) => {
+                const state = applyProgress(JSON.parse(event.data));
+                if (state === 'completed' || state === 'failed') {
+                  source.close();
+                  resolve(state);
+                }
+              };
+              source.onerror = () => {
+                source.close();
+                reject(new Error("Progress stream unavailable"));
+              };
+            });
+          } catch {
+            finalState = null; // Fall back to polling below
+          }
+
           // Poll the progress — token is handled server-side, max 60 attempts (~2 min)
           const MAX_POLL_ATTEMPTS = 60;
           let pollAttempts = 0;
           let isComplete = false;
           while (!isComplete && pollAttempts < MAX_POLL_ATTEMPTS) {
-            pollAttempts++;
-            // We poll via our proxy to avoid CORS; no token in the query string
-            const pollRes = await api.get(`/proxy/progress?url=${encodeURIComponent(progressUrl)}`);
-            const state = pollRes.data.workflow_state;
-            const rawCompletion = pollRes.data.completion;
-            const completion = typeof rawCompletion === 'number' && rawCompletion >= 0 && rawCompletion <= 100
-              ? rawCompletion
-              : 0;
-
-            setProgress(30 + (completion * 0.7)); // Scale 0-100 to 30-100%
+            let state = finalState;
+            if (!state) {
+              pollAttempts++;
+              // We poll via our proxy to avoid CORS; no token in the query string
+              const pollRes = await api.get(`/proxy/progress?url=${encodeURIComponent(progressUrl)}`);
+              state = applyProgress(pollRes.data);
+            }
 
             if (state === 'completed' || state === 'failed') {
               isComplete = true;
@@ -268,6 +367,14 @@ const Dashboard = () => {
                     value={quizContent}
                     onChange={(e) => setQuizContent(e.target.value)}
                   />
+                  {validation && (
+                    <p className={`text-xs ${validation.errors.length > 0 ? "text-destructive" : "text-muted-foreground"}`}>
+                      {validation.questions} question{validation.questions === 1 ? "" : "s"}, {validation.total_points} point{validation.total_points === 1 ? "" : "s"}
+                      {validation.errors.length > 0 && (
+                        <> · {validation.errors.length} error{validation.errors.length > 1 ? "s" : ""} (first on line {validation.errors[0].line_start})</>
+                      )}
+                    </p>
+                  )}
                 </div>
               </CardContent>
             </Card>
@@ -0,0 +1,80 @@
+import api from "@/api"
+
+// Files above this size go through /api/uploads in parts instead of one multipart body
+export const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+
+const PART_ATTEMPTS = 4
+
+const storageKey = (file: File) => `qti-upload:${file.name}:${file.size}:${file.lastModified}`
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms))
+
+async function sha256(file: File): Promise<string | undefined> {
+  // crypto.subtle only exists in secure contexts; the server then checks the size alone
+  if (!window.crypto?.subtle) return undefined
+  const digest = await window.crypto.subtle.digest("SHA-256", await file.arrayBuffer())
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, "0")).join("")
+}
+
+async function resumeOrCreate(file: File) {
+  const previous = localStorage.getItem(storageKey(file))
+  if (previous) {
+    try {
+      return (await api.get(`/uploads/${previous}`)).data
+    } catch {
+      localStorage.removeItem(storageKey(file)) // Expired, or started in another session
+    }
+  }
+  const { data } = await api.post("/uploads", {
+    filename: file.name,
+    content_type: file.type || "application/octet-stream",
+    size: file.size,
+    sha256: await sha256(file),
+  })
+  localStorage.setItem(storageKey(file), data.upload_id)
+  return data
+}
+
+async function putPart(uploadId: string, index: number, part: Blob) {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      await api.put(`/uploads/${uploadId}/parts/${index}`, part, {
+        headers: { "Content-Type": "application/octet-stream" },
+      })
+      return
+    } catch (error: any) {
+      // 4xx other than 408/429 will not get better on retry
+      const status = error.response?.status
+      if (attempt >= PART_ATTEMPTS || (status && status < 500 && status !== 408 && status !== 429)) throw error
+      await sleep(500 * 2 ** attempt)
+    }
+  }
+}
+
+/**
+ * Uploads `file` in parts, skipping any the server already has from an earlier
+ * interrupted attempt at the same file, and returns the `file_id` that
+ * /api/preview and /api/download accept in place of the file.
+ */
+export async function chunkedUpload(file: File, onProgress?: (fraction: number) => void): Promise<string> {
+  const upload = await resumeOrCreate(file)
+  if (!upload.complete) {
+    const received = new Set<number>(upload.parts_received)
+    let sent = received.size
+    for (let index = 0; index < upload.parts_total; index++) {
+      if (received.has(index)) continue
+      const start = index * upload.chunk_size
+      await putPart(upload.upload_id, index, file.slice(start, start + upload.chunk_size))
+      onProgress?.(++sent / upload.parts_total)
+    }
+    try {
+      await api.post(`/uploads/${upload.upload_id}/complete`)
+    } catch (error: any) {
+      // A digest mismatch means the stored parts are bad; start over next time
+      if (error.response?.status === 422) localStorage.removeItem(storageKey(file))
+      throw error
+    }
+  }
+  onProgress?.(1)
+  return upload.upload_id
+}
@@ -1,6 +1,6 @@
 import os
 from datetime import timedelta
-from flask import Flask, render_template, send_from_directory
+from flask import Flask
 from flask_caching import Cache
 from dotenv import load_dotenv
 
@@ -9,6 +9,39 @@ load_dotenv()
 # Initialize cache globally so it can be used by other modules via 'from app import cache'
 cache = Cache()
 
+CACHE_BACKENDS = ('simple', 'filesystem', 'redis')
+
+def _cache_config():
+    """
+    Flask-Caching settings for CACHE_BACKEND. LTI state/nonces, job records and
+    rate-limit budgets live in this cache, so anything but 'simple' (per process)
+    is required once more than one worker serves requests. 'filesystem' shares a
+    directory between workers on one host; 'redis' needs the optional redis package.
+    """
+    backend = os.getenv('CACHE_BACKEND', 'simple').lower()
+    config = {"CACHE_DEFAULT_TIMEOUT": 600}
+    if backend == 'simple':
+        config["CACHE_TYPE"] = "SimpleCache"
+    elif backend == 'filesystem':
+        config.update({
+            "CACHE_TYPE": "FileSystemCache",
+            "CACHE_DIR": os.getenv('CACHE_DIR', '/tmp/flask_cache'),
+            "CACHE_THRESHOLD": int(os.getenv('CACHE_THRESHOLD', '5000')),
+        })
+    elif backend == 'redis':
+        try:
+            import redis  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        config.update({
+            "CACHE_TYPE": "RedisCache",
+            "CACHE_REDIS_URL": os.getenv('CACHE_REDIS_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+            "CACHE_KEY_PREFIX": os.getenv('CACHE_KEY_PREFIX', 'qti:'),
+        })
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND '{backend}'. Expected one of: {', '.join(CACHE_BACKENDS)}")
+    return config
+
 def create_app():
     # Use relative paths for static and template folders as they are inside the 'app' package
     app = Flask(__name__, static_folder="assets", template_folder="templates")
@@ -20,8 +53,6 @@ def create_app():
     app.config.from_mapping({
         "DEBUG": False,
         "ENV": "production",
-        "CACHE_TYPE": "SimpleCache",
-        "CACHE_DEFAULT_TIMEOUT": 600,
         "SECRET_KEY": os.getenv("SECRET_KEY", "replace-me-in-production"),
         "SESSION_TYPE": "filesystem",
         "SESSION_FILE_DIR": SESSION_DIR,
@@ -32,6 +63,7 @@ def create_app():
         "DEBUG_TB_INTERCEPT_REDIRECTS": False,
         "PERMANENT_SESSION_LIFETIME": timedelta(hours=1)
     })
+    app.config.from_mapping(_cache_config())
 
     cache.init_app(app)
 
@@ -39,16 +71,24 @@ def create_app():
     from .routes.api import api_bp
     from .routes.lti import lti_bp
     from .routes.auth import auth_bp
+    from .routes.metrics import metrics_bp
 
     # Register blueprints. API routes are prefixed.
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(lti_bp)
     app.register_blueprint(auth_bp)
+    app.register_blueprint(metrics_bp)
+
+    # Request latency histogram and Server-Timing header on every response
+    from .utils import profiling, timing
+    timing.init_app(app)
+    # Opt-in; registers nothing unless PROFILE_SAMPLE_RATE or PROFILE_ADMIN_SECRET is set
+    profiling.init_app(app)
 
-    # Legacy static assets route
-    @app.route('/assets/<path:filename>')
-    def assets(filename):
-        return send_from_directory(app.static_folder, filename)
+    # Flask's own static route owns /assets/<path:filename>; swap in a view that adds
+    # long-lived caching for hashed bundles and precompressed variants
+    from .utils.static_assets import send_asset
+    app.view_functions['static'] = send_asset
 
     # Root route for React App
     @app.route('/', defaults={'path': ''})
@@ -59,9 +99,13 @@ def create_app():
          an LTI or API route will be served the index.html file, allowing
         React Router to handle the frontend routing.
         """
-        from .utils.vite_manifest import get_vite_assets
-        vite_js_asset, vite_css_asset = get_vite_assets()
-        return render_template('index.html', vite_js_asset=vite_js_asset, vite_css_asset=vite_css_asset)
+        from .utils.render_utils import _render_with_globals
+        from .utils.static_assets import html_max_age
+        response = _render_with_globals('index.html', None, None)
+        # Short-lived so a deploy's new bundle names are picked up quickly
+        response.cache_control.public = True
+        response.cache_control.max_age = html_max_age()
+        return response
 
     return app
 
@@ -1,62 +1,432 @@
-from flask import Blueprint, request, jsonify, Response, send_file, session
+from flask import Blueprint, request, jsonify, Response, send_file, session, current_app, after_this_request
+from werkzeug.datastructures import FileStorage
+import hashlib
 import io
+import json
+import queue
 import re
-import zipfile
+import tempfile
+import threading
 import requests
 import os
 import urllib.parse
-from ..utils.parser import parse_quiz_text
-from ..utils.exporter import create_qti_1_2_package
-from ..utils.file_reader import read_file
+from concurrent.futures import ThreadPoolExecutor
+from ..utils.parser import count_question_blocks, iter_parse_quiz_text, parse_quiz_text, validate_quiz_text
+from ..utils.exporter import create_qti_1_2_package, write_qti_zip
+from ..utils.file_reader import iter_read_file, read_file
+from ..utils import admission, canvas_tokens, cpu_executor, metrics, profiling, uploads
+from ..utils.canvas_migrations import push_qti_package, CanvasAuthError
+from ..utils.progress_cache import get_progress, TERMINAL_STATES
+from ..utils.progress_hub import hub as progress_hub
+from ..utils.jobs import submit_job, submit_job_once, owner_key, get_job, public_view, JobClaimConflict, JobError, JobQueueFull, TERMINAL_STATUSES
+from ..utils.timing import phase
 
 api_bp = Blueprint('api', __name__)
 
+# Packages larger than this are spooled to disk before being streamed to Canvas
+QTI_SPOOL_MAX_MEMORY = int(os.getenv('QTI_SPOOL_MAX_MEMORY', str(1024 * 1024)))
+# Multi-course pushes: parallel uploads per job, and the most courses one request may target
+CANVAS_FANOUT_CONCURRENCY = int(os.getenv('CANVAS_FANOUT_CONCURRENCY', '4'))
+CANVAS_FANOUT_MAX_COURSES = int(os.getenv('CANVAS_FANOUT_MAX_COURSES', '50'))
+# Identical /api/canvas requests within this many seconds reuse the first migration
+CANVAS_IDEMPOTENCY_WINDOW = int(os.getenv('CANVAS_IDEMPOTENCY_WINDOW', '600'))
+# CPU seconds one /api/validate call may use; it runs on every pause in typing
+VALIDATE_CPU_DEADLINE = float(os.getenv('VALIDATE_CPU_DEADLINE', '2'))
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+metrics.describe('qti_input_bytes_total', 'counter', 'Request bytes received by the conversion endpoints, by source (file or text).')
+metrics.describe('qti_questions_total', 'counter', 'Parsed question blocks by type; blocks that failed to parse count as "error".')
+metrics.describe('qti_package_bytes_total', 'counter', 'Bytes of zipped QTI packages produced.')
+
 def _sanitize_filename(title):
     """Strip characters that are unsafe in filenames or Content-Disposition headers."""
     sanitized = re.sub(r'[\r\n\x00\\/:"\'*?<>|]', '', title)
     return sanitized.strip() or 'quiz'
 
+def _extract(file):
+    with phase('read_file'):
+        return cpu_executor.run(read_file, file)
+
+def _read_upload(file):
+    metrics.inc('qti_input_bytes_total', request.content_length or 0, source='file')
+    return _extract(file)
+
+def _stored_upload(file_id):
+    """
+    The session's completed chunked upload `file_id` as a FileStorage read straight
+    from disk, or None. It is closed once the response (streamed or not) is done.
+    """
+    file = uploads.open_file(str(file_id), owner_key())
+    if file is None:
+        return None
+    metrics.inc('qti_input_bytes_total', file.content_length, source='upload')
+
+    @after_this_request
+    def close_upload(response):
+        response.call_on_close(file.close)
+        return response
+    return file
+
+STORED_UPLOAD_NOT_FOUND = "Upload not found or not complete"
+
+def _count_questions(counts):
+    for q_type, count in counts.items():
+        metrics.inc('qti_questions_total', count, type=q_type)
+
+def _parse(quiz_text):
+    """parse_quiz_text, timed as the 'parse' phase and counted by question type."""
+    with phase('parse'):
+        parsed_questions = cpu_executor.run(parse_quiz_text, quiz_text)
+    counts = {}
+    for question in parsed_questions:
+        counts[question.get('type')] = counts.get(question.get('type'), 0) + 1
+    _count_questions(counts)
+    return parsed_questions
+
+def _ndjson(payload):
+    return json.dumps(payload) + "\n"
+
+def _extract_with_progress(upload):
+    """Yields a progress line per extracted PDF page; returns the extracted text."""
+    reader = iter_read_file(upload)
+    with phase('read_file'):
+        while True:
+            try:
+                done, total = cpu_executor.run(next, reader)
+            except StopIteration as finished:
+                return finished.value
+            yield _ndjson({"progress": {"stage": "extracting", "done": done, "total": total}})
+
+def _stream_preview(quiz_text, upload=None):
+    """
+    NDJSON body for a streamed /api/preview. For a PDF upload it starts with a
+    {"progress": {"stage": "extracting", ...}} line per page, then one
+    {"progress": {"stage": "parsing", "done": 0, "total": N}} line giving the number
+    of blocks. A {"question": ...} line follows per block as soon as it is parsed
+    (failed blocks are question entries of type "error"), and a final
+    {"summary": ...} line holds counts by type and the errors.
+    """
+    counts = {}
+    errors = []
+    complete = True
+    try:
+        if upload is not None:
+            quiz_text = yield from _extract_with_progress(upload)
+        yield _ndjson({"progress": {"stage": "parsing", "done": 0, "total": count_question_blocks(quiz_text)}})
+
+        questions = iter_parse_quiz_text(quiz_text)
+        with phase('parse'):
+            while True:
+                # Block by block, so in async mode the parser still runs off the event loop
+                question = cpu_executor.run(next, questions, None)
+                if question is None:
+                    break
+                counts[question.get('type')] = counts.get(question.get('type'), 0) + 1
+                if question.get('type') == 'error':
+                    errors.append({"id": question['id'], "error": question['error']})
+                yield _ndjson({"question": question})
+    except admission.DeadlineExceeded:
+        complete = False
+        yield _ndjson({"error": admission.DEADLINE_MESSAGE})
+    _count_questions(counts)
+    yield _ndjson({"summary": {
+        "questions": sum(counts.values()),
+        "counts": counts,
+        "errors": errors,
+        "complete": complete,
+    }})
+
+def _zip(fileobj, qti_package):
+    """Zips the package into `fileobj`, timed as the 'zip' phase. Returns the zip size."""
+    with phase('zip'):
+        cpu_executor.run(write_qti_zip, fileobj, qti_package)
+    size = fileobj.tell()
+    metrics.inc('qti_package_bytes_total', size)
+    return size
+
 @api_bp.route("/preview", methods=['POST'])
+@admission.limited
 def preview():
+    """
+    Parsed questions as one JSON document, or, when the client sends
+    `Accept: application/x-ndjson`, streamed with extraction and parsing progress
+    and one line per question as they are parsed. The quiz comes as a multipart
+    `file`, as JSON `quiz_text`, or as JSON `file_id` naming a completed upload.
+    """
+    streamed = request.accept_mimetypes.best == NDJSON_MIMETYPE
+    upload = None
     if request.content_type.startswith("multipart/form-data"):
         file = request.files.get("file")
-        if file:
-            content = read_file(file)
-            parsed_questions = parse_quiz_text(content)
-        else:
+        if not file:
             return jsonify({"error": "No file provided"}), 400
+        if streamed:
+            # Extracted inside the stream so page progress reaches the client. Flask closes
+            # uploaded files when the view returns, so the stream works from a copy.
+            metrics.inc('qti_input_bytes_total', request.content_length or 0, source='file')
+            upload = FileStorage(io.BytesIO(file.read()), filename=file.filename, content_type=file.content_type)
+            quiz_text = None
+        else:
+            quiz_text = _read_upload(file)
     else:
         data = request.get_json()
-        parsed_questions = parse_quiz_text(data.get("quiz_text", ""))
-    return jsonify({"questions": parsed_questions})
+        if data.get("file_id"):
+            # A document sent beforehand through /api/uploads
+            upload = _stored_upload(data["file_id"])
+            if upload is None:
+                return jsonify({"error": STORED_UPLOAD_NOT_FOUND}), 404
+            quiz_text = None if streamed else _extract(upload)
+        else:
+            metrics.inc('qti_input_bytes_total', request.content_length or 0, source='text')
+            quiz_text = data.get("quiz_text", "")
+
+    if streamed:
+        return Response(_stream_preview(quiz_text, upload), mimetype=NDJSON_MIMETYPE, headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+    return jsonify({"questions": _parse(quiz_text)})
+
+@api_bp.route("/validate", methods=['POST'])
+def validate():
+    """
+    Cheap syntax check for the editor: counts by type, total points and errors with
+    their line ranges, without the question and answer payload of /api/preview.
+    It sits outside the conversion gate, so typing is never answered with a 503
+    while conversions run; its own VALIDATE_CPU_DEADLINE keeps it cheap instead.
+    """
+    data = request.get_json(silent=True) or {}
+    quiz_text = data.get("quiz_text", "")
+    if not isinstance(quiz_text, str):
+        return jsonify({"error": "quiz_text must be a string"}), 400
+    try:
+        with phase('validate'), admission.budget(VALIDATE_CPU_DEADLINE):
+            return jsonify(cpu_executor.run(validate_quiz_text, quiz_text))
+    except admission.DeadlineExceeded:
+        return jsonify({"error": "This document is too large to check while typing. Use Preview instead."}), 422
 
 @api_bp.route("/download", methods=['POST'])
+@admission.limited
 def download():
     if request.content_type.startswith("multipart/form-data"):
         title = _sanitize_filename(request.form.get("quiz_title", ""))
         file = request.files.get("file")
         if file:
-            content = read_file(file)
-            parsed_questions = parse_quiz_text(content)
+            content = _read_upload(file)
+            parsed_questions = _parse(content)
         else:
             return jsonify({"error": "No file provided"}), 400
     else:
         data = request.get_json()
         title = _sanitize_filename((data.get("quiz_title") or "").strip())
-        parsed_questions = parse_quiz_text(data.get("quiz_text", ""))
+        if data.get("file_id"):
+            upload = _stored_upload(data["file_id"])
+            if upload is None:
+                return jsonify({"error": STORED_UPLOAD_NOT_FOUND}), 404
+            parsed_questions = _parse(_extract(upload))
+        else:
+            metrics.inc('qti_input_bytes_total', request.content_length or 0, source='text')
+            parsed_questions = _parse(data.get("quiz_text", ""))
     
-    qti_package = create_qti_1_2_package(title, parsed_questions)
+    qti_package = cpu_executor.run(create_qti_1_2_package, title, parsed_questions)
 
     # Create a zip file in memory
     zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        zip_file.writestr("quiz.qti.xml", qti_package.encode("utf-8"))
-
-    zip_buffer.seek(0)
-    return Response(zip_buffer.read(), mimetype="application/zip", headers={
+    _zip(zip_buffer, qti_package)
+    return Response(zip_buffer.getvalue(), mimetype="application/zip", headers={
         "Content-Disposition": f'attachment; filename="{title}_package.zip"'
     })
 
+def _upload_error(e):
+    return jsonify({"error": e.message}), e.status_code
+
+def _owned_upload(upload_id):
+    # Uploads are only visible to the session that created them
+    return uploads.get(upload_id, owner_key())
+
+@api_bp.route("/uploads", methods=['POST'])
+def create_upload():
+    """
+    Starts a resumable upload of a large source document. The body gives its
+    `filename`, `size` in bytes, optional `content_type` and optional `sha256`
+    (checked when the upload completes). The response says the part size to use.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        meta = uploads.create(owner_key(), data.get("filename"), data.get("content_type"), data.get("size"),
+                              data.get("sha256"))
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return jsonify(uploads.status(meta)), 201
+
+@api_bp.route("/uploads/<upload_id>", methods=['GET'])
+def upload_status(upload_id):
+    """Which parts the server already has, so an interrupted client can resume with the rest."""
+    meta = _owned_upload(upload_id)
+    if not meta:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(uploads.status(meta))
+
+@api_bp.route("/uploads/<upload_id>/parts/<int:index>", methods=['PUT'])
+def upload_part(upload_id, index):
+    """Stores one part, sent as the raw request body. Sending a part again replaces it."""
+    meta = _owned_upload(upload_id)
+    if not meta:
+        return jsonify({"error": "Upload not found"}), 404
+    if request.content_length is None:
+        return jsonify({"error": "Content-Length is required"}), 411
+    try:
+        uploads.write_part(meta, index, request.stream, request.content_length)
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return '', 204
+
+@api_bp.route("/uploads/<upload_id>/complete", methods=['POST'])
+def complete_upload(upload_id):
+    """
+    Assembles the parts and verifies the size and digest. The upload id is then the
+    `file_id` that /api/preview and /api/download accept in place of a file.
+    """
+    meta = _owned_upload(upload_id)
+    if not meta:
+        return jsonify({"error": "Upload not found"}), 404
+    try:
+        with phase('assemble'):
+            meta = cpu_executor.run(uploads.complete, meta)
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return jsonify({**uploads.status(meta), "file_id": meta['upload_id']})
+
+@api_bp.route("/uploads/<upload_id>", methods=['DELETE'])
+def delete_upload(upload_id):
+    meta = _owned_upload(upload_id)
+    if not meta:
+        return jsonify({"error": "Upload not found"}), 404
+    uploads.delete(meta)
+    return '', 204
+
+def _build_package(job, title, quiz_text, package):
+    """Parses and exports the quiz into `package` as a zip. Returns its size, rewound to the start."""
+    # Jobs are already bounded by the job backend, so they wait for a work slot rather than being rejected
+    try:
+        with admission.slot():
+            job.set_phase('parsing')
+            parsed_questions = _parse(quiz_text)
+            job.set_phase('exporting')
+            qti_package = cpu_executor.run(create_qti_1_2_package, title, parsed_questions)
+
+            job.set_phase('zipping')
+            package_size = _zip(package, qti_package)
+    except admission.DeadlineExceeded:
+        raise JobError(admission.DEADLINE_MESSAGE, 422)
+    package.seek(0)
+    return package_size
+
+def _canvas_job_error(e):
+    """Maps an exception raised while pushing to Canvas onto the JobError the client sees."""
+    if isinstance(e, JobError):
+        return e
+    if isinstance(e, CanvasAuthError):
+        return JobError(str(e), 401)
+    if isinstance(e, requests.exceptions.HTTPError):
+        error_msg = e.response.text if hasattr(e.response, 'text') else str(e)
+        return JobError(f"Canvas API Error: {error_msg}", 500)
+    return JobError(f"Internal Server Error: {str(e)}", 500)
+
+def _run_canvas_push(job, course_id, title, quiz_text, token_source):
+    """Job body for /api/canvas: builds the QTI package and hands it to a Canvas content migration."""
+    # 1. Zip into a spooled file: small packages stay in memory, large ones go to disk
+    with tempfile.SpooledTemporaryFile(max_size=QTI_SPOOL_MAX_MEMORY) as package:
+        package_size = _build_package(job, title, quiz_text, package)
+        try:
+            progress_url = push_qti_package(course_id, title, package, package_size, token_source, on_phase=job.set_phase)
+        except Exception as e:
+            raise _canvas_job_error(e)
+
+    # Return the progress URL so the React frontend can poll it
+    return {"progress_url": progress_url}
+
+def _run_canvas_fanout(job, course_ids, title, quiz_text, token_source):
+    """Job body for /api/canvas/batch: builds the package once and pushes it to every course concurrently."""
+    app = current_app._get_current_object()
+    courses = {course_id: {"status": "queued"} for course_id in course_ids}
+    lock = threading.Lock()
+
+    def update(course_id, **fields):
+        with lock:
+            courses[course_id].update(fields)
+            job.update(courses=courses)
+
+    # On disk so every concurrent upload can read it through its own file handle
+    with tempfile.NamedTemporaryFile(suffix='.zip') as package:
+        package_size = _build_package(job, title, quiz_text, package)
+        package.flush()
+
+        def push(course_id):
+            with app.app_context(), open(package.name, 'rb') as course_package:
+                try:
+                    progress_url = push_qti_package(
+                        course_id, title, course_package, package_size, token_source,
+                        on_phase=lambda phase: update(course_id, status=phase),
+                    )
+                except Exception as e:
+                    error = _canvas_job_error(e)
+                    update(course_id, status='failed', error=error.message, status_code=error.status_code)
+                else:
+                    update(course_id, status='succeeded', progress_url=progress_url)
+
+        job.set_phase('pushing', courses=courses)
+        with ThreadPoolExecutor(max_workers=min(CANVAS_FANOUT_CONCURRENCY, len(course_ids))) as pool:
+            list(pool.map(push, course_ids))
+
+    failed = [c for c in courses.values() if c['status'] == 'failed']
+    # Nothing got through because the token is dead: fail the job so the session is cleared
+    if failed and len(failed) == len(courses) and all(c.get('status_code') == 401 for c in failed):
+        raise JobError(failed[0]['error'], 401)
+    return {"courses": courses, "succeeded": len(courses) - len(failed), "failed": len(failed)}
+
+def _job_response(job, status_code=200):
+    # A 401 that survived a refresh attempt means the session must authorize again
+    if job.get('status_code') == 401:
+        session.pop('canvas_api_token', None)
+    return jsonify(public_view(job)), status_code
+
+def _migration_failed(job, token_source):
+    """True if `job` handed Canvas a migration that Canvas has since reported as failed."""
+    progress_url = (job.get('result') or {}).get('progress_url')
+    if job['status'] != 'succeeded' or not progress_url or not _is_valid_progress_url(progress_url):
+        return False
+    try:
+        return get_progress(progress_url, token_source).get('workflow_state') == 'failed'
+    except requests.exceptions.RequestException:
+        return False
+
+def _submit_canvas_job(kind, fn, *args, idempotency_key=None, replayable=None):
+    replayed = False
+    try:
+        if idempotency_key:
+            job, replayed = submit_job_once(idempotency_key, CANVAS_IDEMPOTENCY_WINDOW, kind, fn, *args,
+                                            replayable=replayable)
+        else:
+            job = submit_job(kind, fn, *args)
+    except JobQueueFull:
+        return jsonify({"error": "Too many uploads in progress. Please try again shortly."}), 503, {"Retry-After": "5"}
+    except JobClaimConflict:
+        return jsonify({"error": "This upload is already being retried. Please try again shortly."}), 409, {"Retry-After": "1"}
+
+    payload = public_view(job)
+    payload["job_id"] = job['id']
+    payload["status_url"] = f"/api/jobs/{job['id']}"
+    payload["replayed"] = replayed
+
+    # Inline backends finish before returning, so keep the synchronous response shape
+    if job['status'] == 'succeeded':
+        payload.update({"message": "Upload initiated successfully", **job['result']})
+    elif job['status'] == 'failed':
+        return _job_response({**payload, "error": job['error']}, job.get('status_code', 500))
+    else:
+        payload["message"] = "Upload queued"
+    return jsonify(payload), 202 if job['status'] not in TERMINAL_STATUSES else 200
+
 @api_bp.route('/canvas', methods=['POST'])
 def canvas():
     data = request.json
@@ -64,129 +434,143 @@ def canvas():
     # Use course ID from request body if provided, otherwise from session
     course_id = data.get('course_id') or session.get('canvas_course_id')
     # Always use the Canvas API token from the server-side session only
-    access_token = session.get('canvas_api_token')
+    token_source = canvas_tokens.for_session()
 
     if not course_id:
         return jsonify({"error": "Missing Canvas Course ID. Please refresh the tool launch."}), 400
-    if not access_token:
+    if not token_source:
         # 401 triggers the React frontend to initiate OAuth
         return jsonify({"error": "Missing Canvas API Token, please authorize"}), 401
 
+    metrics.inc('qti_input_bytes_total', request.content_length or 0, source='text')
     title = _sanitize_filename((data.get("quiz_title") or "").strip())
-    parsed_questions = parse_quiz_text(data.get("quiz_text", ""))
-    qti_package = create_qti_1_2_package(title, parsed_questions)
+    quiz_text = data.get("quiz_text", "")
 
-    # 1. Create a zip file in memory
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        zip_file.writestr("quiz.qti.xml", qti_package.encode("utf-8"))
-    
-    zip_buffer.seek(0)
-    zip_content = zip_buffer.read()
-    zip_size = len(zip_content)
+    # Double-clicks and client retries must not start a second migration. The
+    # package is a pure function of title and text (answer idents are randomised
+    # on export, so the zip bytes themselves are not stable), so those stand in
+    # for the package hash.
+    idempotency_key = hashlib.sha256(
+        "\0".join([owner_key(), str(course_id), title, quiz_text]).encode("utf-8")
+    ).hexdigest()
 
-    CANVAS_DOMAIN = os.getenv('CANVAS_DOMAIN')
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
+    # Parsing, export and the Canvas round trip run on the job backend so the
+    # request thread is released immediately.
+    # A migration that failed in Canvas is not replayed, so the user can simply try again
+    return _submit_canvas_job('canvas_push', profiling.job(_run_canvas_push), course_id, title, quiz_text, token_source,
+                              idempotency_key=idempotency_key,
+                              replayable=lambda job: not _migration_failed(job, token_source))
 
-    try:
-        # STEP 1: Initiate Content Migration
-        mig_url = f"{CANVAS_DOMAIN}/api/v1/courses/{course_id}/content_migrations"
-        mig_payload = {
-            'migration_type': 'qti_converter',
-            'pre_attachment': {
-                'name': f'{title}.zip',
-                'size': zip_size,
-                'content_type': 'application/zip'
-            }
-        }
-        
-        mig_res = requests.post(mig_url, json=mig_payload, headers=headers)
-        
-        # If Canvas says the token is invalid/expired, clear it and ask for re-auth
-        if mig_res.status_code == 401:
-            session.pop('canvas_api_token', None)
-            return jsonify({"error": "Canvas token expired. Please close and relaunch the tool."}), 401
-        
-        mig_res.raise_for_status()
-        migration_data = mig_res.json()
-        
-        pre_auth = migration_data.get('pre_attachment', {})
-        upload_url = pre_auth.get('upload_url')
-        upload_params = pre_auth.get('upload_params', {})
-        progress_url = migration_data.get('progress_url')
-        
-        if not upload_url:
-            raise Exception("Failed to receive upload_url from Canvas")
+@api_bp.route('/canvas/batch', methods=['POST'])
+def canvas_batch():
+    """Pushes one quiz to several courses (e.g. every section an instructor teaches) in a single job."""
+    data = request.json
+    token_source = canvas_tokens.for_session()
 
-        # STEP 2: Upload File Data
-        files = {'file': (f'{title}.zip', zip_content, 'application/zip')}
-        
-        # Upload the file without following redirects so we can explicitly handle
-        # the Canvas redirect behavior and surface real errors.
-        upload_res = requests.post(
-            upload_url,
-            data=upload_params,
-            files=files,
-            allow_redirects=False
-        )
-
-        # If Canvas says the token is invalid/expired during upload, clear it and ask for re-auth
-        if upload_res.status_code == 401:
-            session.pop('canvas_api_token', None)
-            return jsonify({"error": "Canvas token expired during upload. Please close and relaunch the tool."}), 401
-
-        # Treat 2xx as success and 3xx as the expected redirect handoff.
-        if 200 <= upload_res.status_code < 300:
-            pass
-        elif 300 <= upload_res.status_code < 400:
-            # Expected behavior: Canvas returns a redirect after a successful upload.
-            # We do not follow it here to avoid spurious 401s from downstream endpoints.
-            pass
-        else:
-            # Any other status is an error; raise so the outer HTTPError handler can respond.
-            upload_res.raise_for_status()
-        
-        # Return the progress URL so the React frontend can poll it
-        return jsonify({
-            "message": "Upload initiated successfully", 
-            "progress_url": progress_url
-        })
-        
-    except requests.exceptions.HTTPError as e:
-        error_msg = e.response.text if hasattr(e.response, 'text') else str(e)
-        return jsonify({"error": f"Canvas API Error: {error_msg}"}), 500
-    except Exception as e:
-        return jsonify({"error": f"Internal Server Error: {str(e)}"}), 500
+    raw_ids = data.get('course_ids')
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return jsonify({"error": "course_ids must be a non-empty list"}), 400
+    course_ids = list(dict.fromkeys(str(c).strip() for c in raw_ids))
+    if len(course_ids) > CANVAS_FANOUT_MAX_COURSES:
+        return jsonify({"error": f"At most {CANVAS_FANOUT_MAX_COURSES} courses can be pushed at once"}), 400
+    if not all(re.fullmatch(r'[\w:.-]+', c) for c in course_ids):
+        return jsonify({"error": "Invalid course id"}), 400
+    if not token_source:
+        # 401 triggers the React frontend to initiate OAuth
+        return jsonify({"error": "Missing Canvas API Token, please authorize"}), 401
+
+    metrics.inc('qti_input_bytes_total', request.content_length or 0, source='text')
+    title = _sanitize_filename((data.get("quiz_title") or "").strip())
+    return _submit_canvas_job('canvas_batch_push', _run_canvas_fanout, course_ids, title, data.get("quiz_text", ""), token_source)
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job(job_id)
+    # Jobs are only visible to the session that created them
+    if not job or job.get('owner') != session.get('job_owner'):
+        return jsonify({"error": "Job not found"}), 404
+    return _job_response(job)
+
+def _is_valid_progress_url(progress_url):
+    """SSRF protection: restrict to the configured Canvas domain and expected path."""
+    CANVAS_DOMAIN = os.getenv('CANVAS_DOMAIN', '').rstrip('/')
+    try:
+        parsed = urllib.parse.urlparse(progress_url)
+        canvas_parsed = urllib.parse.urlparse(CANVAS_DOMAIN)
+        return parsed.netloc == canvas_parsed.netloc and parsed.path.startswith('/api/v1/progress/')
+    except Exception:
+        return False
 
 @api_bp.route('/proxy/progress', methods=['GET'])
 def proxy_progress():
     # Helper endpoint for React to poll progress without dealing with CORS.
     # The Canvas token is read from the server-side session only and never from the client.
-    access_token = session.get('canvas_api_token')
+    token_source = canvas_tokens.for_session()
     progress_url = request.args.get('url')
     
-    if not access_token or not progress_url:
+    if not token_source or not progress_url:
         return jsonify({"error": "Missing token or url"}), 400
 
-    # SSRF protection: restrict to the configured Canvas domain and expected path
-    CANVAS_DOMAIN = os.getenv('CANVAS_DOMAIN', '').rstrip('/')
-    try:
-        parsed = urllib.parse.urlparse(progress_url)
-        canvas_parsed = urllib.parse.urlparse(CANVAS_DOMAIN)
-        if parsed.netloc != canvas_parsed.netloc or not parsed.path.startswith('/api/v1/progress/'):
-            return jsonify({"error": "Invalid progress URL"}), 400
-    except Exception:
+    if not _is_valid_progress_url(progress_url):
         return jsonify({"error": "Invalid progress URL"}), 400
         
     try:
-        res = requests.get(progress_url, headers={"Authorization": f"Bearer {access_token}"})
-        res.raise_for_status()
-        return jsonify(res.json())
+        return jsonify(get_progress(progress_url, token_source))
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 500
 
+_active_streams = threading.BoundedSemaphore(int(os.getenv('PROGRESS_STREAM_LIMIT', '4')))
+
+@api_bp.route('/progress/stream', methods=['GET'])
+def progress_stream():
+    """
+    Server-Sent Events feed of a migration's progress. Every tab watching the same
+    progress URL shares one server-side poller; the stream ends after a terminal state.
+    """
+    token_source = canvas_tokens.for_session()
+    progress_url = request.args.get('url')
+
+    if not token_source or not progress_url:
+        return jsonify({"error": "Missing token or url"}), 400
+    if not _is_valid_progress_url(progress_url):
+        return jsonify({"error": "Invalid progress URL"}), 400
+
+    # Each open stream pins a worker thread, so cap them and let clients fall back to polling
+    if not _active_streams.acquire(blocking=False):
+        return jsonify({"error": "Too many progress streams open"}), 503, {"Retry-After": "2"}
+
+    app = current_app._get_current_object()
+    keepalive = float(os.getenv('PROGRESS_STREAM_KEEPALIVE', '15'))
+    events = progress_hub.subscribe(app, progress_url, token_source)
+
+    def generate():
+        while True:
+            try:
+                event = events.get(timeout=keepalive)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                break
+            if event["event"] == "error":
+                yield f"event: canvas_error\ndata: {json.dumps({'error': event['error']})}\n\n"
+                break
+            yield f"data: {json.dumps(event['data'])}\n\n"
+            if event["data"].get("workflow_state") in TERMINAL_STATES:
+                break
+
+    def close():
+        progress_hub.unsubscribe(progress_url, token_source, events)
+        _active_streams.release()
+
+    response = Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    # Runs when the server closes the response, including client disconnects
+    response.call_on_close(close)
+    return response
+
 @api_bp.route('/instructions')
 def download_instructions():
     # Use absolute path relative to this file
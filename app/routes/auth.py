@@ -2,6 +2,8 @@ from flask import Blueprint, request, redirect, session, jsonify
 import requests
 import urllib.parse
 import os
+from ..utils import canvas_client, canvas_tokens
+from ..utils.jobs import owner_key
 from ..utils.render_utils import _render_with_globals
 
 auth_bp = Blueprint('auth', __name__)
@@ -60,7 +62,10 @@ def auth_callback():
         'code': code
     }
     
-    response = requests.post(f"{CANVAS_DOMAIN}/login/oauth2/token", data=payload)
+    try:
+        response = canvas_client.post(f"{CANVAS_DOMAIN}/login/oauth2/token", data=payload)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": "Token exchange failed", "details": str(e)}), 502
 
     if not response.ok:
         return jsonify({"error": "Token exchange failed", "details": response.text}), 400
@@ -74,6 +79,8 @@ def auth_callback():
         session.permanent = True
         session['canvas_api_token'] = token_data['access_token']
         session['canvas_course_id'] = course_id  # Re-store in case session didn't round-trip
+        # Fixes the job owner now so concurrent first uploads share it; the refresh token is kept server-side under it
+        canvas_tokens.store(owner_key(), token_data)
         return redirect(f'/launch_success?course_id={course_id}')
     
     return jsonify({"error": "Failed to obtain API token", "details": token_data}), 400
@@ -1,14 +1,14 @@
-from flask import Blueprint, request, redirect, session, jsonify
-from pylti1p3.contrib.flask import FlaskOIDCLogin, FlaskRequest, FlaskMessageLaunch
-from pylti1p3.tool_config import ToolConfJsonFile
-from ..utils.lti_utils import get_lti_config_path, get_launch_data_storage
+import os
+from flask import Blueprint, Response, request, redirect, session
+from pylti1p3.contrib.flask import FlaskOIDCLogin, FlaskRequest
+from ..utils.lti_utils import get_tool_conf, get_launch_data_storage, get_jwks_document, CachedKeyMessageLaunch
 from ..utils.render_utils import _render_with_globals
 
 lti_bp = Blueprint('lti', __name__)
 
 @lti_bp.route('/login/', methods=['POST', 'GET'])
 def login():
-    tool_conf = ToolConfJsonFile(get_lti_config_path())
+    tool_conf = get_tool_conf()
     launch_data_storage = get_launch_data_storage()
 
     flask_request = FlaskRequest()
@@ -21,11 +21,11 @@ def login():
 
 @lti_bp.route('/launch/', methods=['POST'])
 def launch():
-    tool_conf = ToolConfJsonFile(get_lti_config_path())
+    tool_conf = get_tool_conf()
     flask_request = FlaskRequest()
     launch_data_storage = get_launch_data_storage()
 
-    message_launch = FlaskMessageLaunch(request=flask_request, tool_config=tool_conf, launch_data_storage=launch_data_storage)
+    message_launch = CachedKeyMessageLaunch(request=flask_request, tool_config=tool_conf, launch_data_storage=launch_data_storage)
     launch_data = message_launch.get_launch_data()
     
     # 1. Capture the Course ID from the LTI Launch Claim
@@ -44,5 +44,10 @@ def launch():
 
 @lti_bp.route('/jwks/', methods=['GET'])
 def get_jwks():
-    tool_conf = ToolConfJsonFile(get_lti_config_path())
-    return jsonify(tool_conf.get_jwks())
+    # Platforms fetch this often; serve a precomputed body and let them revalidate with If-None-Match
+    body, etag = get_jwks_document()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = int(os.getenv('LTI_JWKS_MAX_AGE', '900'))
+    return response.make_conditional(request)
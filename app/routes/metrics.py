@@ -0,0 +1,16 @@
+import hmac
+import os
+from flask import Blueprint, Response, request
+from ..utils import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Optional bearer token so the endpoint can be exposed without publishing internals
+    expected = os.getenv('METRICS_TOKEN')
+    if expected:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f"Bearer {expected}"):
+            return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
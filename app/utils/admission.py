@@ -0,0 +1,213 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import jsonify
+from . import metrics
+
+# Admission control for the CPU-heavy conversion work (file extraction, parsing,
+# export). At most ADMISSION_CONCURRENCY requests per process run it at once and
+# ADMISSION_QUEUE_SIZE more may wait briefly for a slot; anything beyond that is
+# turned away with a fast 503 so the remaining threads stay free for LTI
+# launches, /jwks/ and polling. Under the gthread worker, waiting requests and
+# progress streams hold a thread each, so slots and queue are clamped to fit in
+# GUNICORN_THREADS alongside PROGRESS_STREAM_LIMIT streams and
+# ADMISSION_RESERVED_THREADS spare threads (see _thread_budget).
+#
+# Work that is admitted also runs under a CPU-time deadline that the parser and
+# file reader check between blocks/pages, so one pathological document cannot
+# hold a slot indefinitely.
+
+metrics.describe('qti_admission_in_flight', 'gauge', 'Conversion requests and jobs currently holding a work slot.')
+metrics.describe('qti_admission_queue_depth', 'gauge', 'Conversion requests and jobs waiting for a work slot.')
+metrics.describe('qti_admission_rejected_total', 'counter',
+                 'Conversion requests turned away with 503, by reason (queue_full, timeout).')
+metrics.describe('qti_deadline_exceeded_total', 'counter', 'Conversions aborted for exceeding PARSE_CPU_DEADLINE.')
+
+class Overloaded(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+class DeadlineExceeded(Exception):
+    """Raised by check() once the current conversion has used up its CPU-time budget."""
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+def retry_after():
+    return str(int(_env_float('ADMISSION_RETRY_AFTER', 5)))
+
+def _thread_budget():
+    """
+    Threads of a gthread worker that conversions may hold, running or queued, or
+    None under gevent, where a waiting request costs no thread.
+    """
+    if os.getenv('GUNICORN_WORKER_CLASS', 'gthread') != 'gthread':
+        return None
+    return (int(_env_float('GUNICORN_THREADS', 12)) - int(_env_float('PROGRESS_STREAM_LIMIT', 4))
+            - int(_env_float('ADMISSION_RESERVED_THREADS', 2)))
+
+class _Gate:
+    def __init__(self, slots, queue_size):
+        self.slots = slots
+        self.queue_size = queue_size
+        self.running = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def _publish(self):
+        metrics.set_gauge('qti_admission_in_flight', self.running)
+        metrics.set_gauge('qti_admission_queue_depth', self.waiting)
+
+    def acquire(self, timeout):
+        """
+        Takes a slot, waiting up to `timeout` seconds (None: as long as it takes,
+        and never rejected for a full queue). Raises Overloaded otherwise.
+        """
+        with self._cond:
+            if self.running < self.slots and not self.waiting:
+                self.running += 1
+                self._publish()
+                return
+            if timeout is not None and self.waiting >= self.queue_size:
+                raise Overloaded('queue_full')
+            self.waiting += 1
+            self._publish()
+            try:
+                if not self._cond.wait_for(lambda: self.running < self.slots, timeout):
+                    raise Overloaded('timeout')
+                self.running += 1
+            finally:
+                self.waiting -= 1
+                self._publish()
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._publish()
+            self._cond.notify()
+
+_gate = None
+_gate_pid = None
+_gate_lock = threading.Lock()
+
+def get_gate():
+    global _gate, _gate_pid
+    pid = os.getpid()
+    if _gate is None or _gate_pid != pid:
+        with _gate_lock:
+            if _gate is None or _gate_pid != pid:
+                slots = max(1, int(_env_float('ADMISSION_CONCURRENCY', 2)))
+                queue_size = max(0, int(_env_float('ADMISSION_QUEUE_SIZE', 4)))
+                budget = _thread_budget()
+                if budget is not None:
+                    slots = max(1, min(slots, budget))
+                    queue_size = max(0, min(queue_size, budget - slots))
+                _gate = _Gate(slots=slots, queue_size=queue_size)
+                _gate_pid = pid
+    return _gate
+
+# --- CPU-time deadline ---
+
+_local = threading.local()
+
+def check():
+    """Cooperative cancellation point: raises DeadlineExceeded if the running conversion is over budget."""
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is not None and time.thread_time() > deadline:
+        metrics.inc('qti_deadline_exceeded_total')
+        raise DeadlineExceeded()
+
+@contextmanager
+def cpu_budget(seconds):
+    """Lets the enclosed block use `seconds` of this thread's CPU time before check() raises."""
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = time.thread_time() + seconds
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+def handoff_budget():
+    """CPU seconds the current conversion has left for work run in another thread, or None outside one."""
+    return getattr(_local, 'budget', None)
+
+def charge(seconds):
+    """Counts CPU time spent in another thread on the current conversion's behalf against its budget."""
+    if getattr(_local, 'budget', None) is not None:
+        _local.budget -= seconds
+
+@contextmanager
+def budget(seconds):
+    """
+    Gives the enclosed work `seconds` of CPU time, including work it hands to
+    cpu_executor threads, before check() raises DeadlineExceeded.
+    """
+    previous_budget = getattr(_local, 'budget', None)
+    _local.budget = seconds
+    try:
+        with cpu_budget(seconds):
+            yield
+    finally:
+        _local.budget = previous_budget
+
+def _conversion_budget():
+    return budget(_env_float('PARSE_CPU_DEADLINE', 30))
+
+@contextmanager
+def slot(timeout=None):
+    """
+    Holds a work slot and a CPU-time deadline (PARSE_CPU_DEADLINE seconds) for the
+    enclosed conversion. Raises Overloaded if no slot frees up within `timeout`.
+    """
+    gate = get_gate()
+    gate.acquire(timeout)
+    try:
+        with _conversion_budget():
+            yield
+    finally:
+        gate.release()
+
+def _budgeted(body):
+    with _conversion_budget():
+        yield from body
+
+DEADLINE_MESSAGE = "This document took too long to process. Try splitting it into smaller files."
+
+def limited(view):
+    """
+    Route decorator for conversion endpoints: waits at most ADMISSION_QUEUE_TIMEOUT
+    seconds for a slot, then answers 503 with Retry-After. A conversion that runs
+    past its deadline answers 422. A streamed response keeps the slot, with a fresh
+    CPU budget, until its body has been sent or the client goes away.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        gate = get_gate()
+        try:
+            gate.acquire(_env_float('ADMISSION_QUEUE_TIMEOUT', 5))
+        except Overloaded as e:
+            metrics.inc('qti_admission_rejected_total', reason=e.reason)
+            return jsonify({"error": "The server is busy converting other quizzes. Please try again shortly."}), 503, {
+                "Retry-After": retry_after()}
+
+        handed_off = False
+        try:
+            with _conversion_budget():
+                response = view(*args, **kwargs)
+            if getattr(response, 'is_streamed', False):
+                response.response = _budgeted(response.response)
+                response.call_on_close(gate.release)
+                handed_off = True
+            return response
+        except DeadlineExceeded:
+            return jsonify({"error": DEADLINE_MESSAGE}), 422
+        finally:
+            if not handed_off:
+                gate.release()
+    return wrapper
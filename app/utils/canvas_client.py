@@ -0,0 +1,156 @@
+import os
+import random
+import threading
+import time
+import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from . import canvas_throttle, cpu_executor, metrics, timing
+
+# Statuses worth another attempt. 502/503 mean the gateway in front of Canvas could
+# not hand the request to the app, so replaying a POST is safe. A 504 means the
+# gateway gave up waiting while Canvas may still be working on it, and a plain 500
+# may have been partially processed, so only idempotent calls retry those.
+RETRY_STATUSES = {502, 503}
+IDEMPOTENT_RETRY_STATUSES = RETRY_STATUSES | {500, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+metrics.describe('canvas_request_duration_seconds', 'histogram',
+                 'Outbound Canvas call latency per attempt, by method, route and status (or exception).')
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+def get_timeout():
+    """(connect, read) timeout applied to every outbound Canvas call unless the caller overrides it."""
+    return (_env_float('CANVAS_CONNECT_TIMEOUT', 5), _env_float('CANVAS_READ_TIMEOUT', 60))
+
+def get_session():
+    """
+    Returns the per-process pooled session. Connections (and their TLS sessions)
+    are kept alive and reused across requests and threads. The session is rebuilt
+    after a fork so gunicorn workers never share sockets with the master.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                # Async mode keeps many more calls in flight per process
+                pool_size = int(_env_float('CANVAS_HTTP_POOL_SIZE', 100 if cpu_executor.cooperative() else 10))
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff, capped so a retry never outlasts a request timeout."""
+    base = _env_float('CANVAS_RETRY_BACKOFF', 0.5)
+    cap = _env_float('CANVAS_RETRY_BACKOFF_MAX', 8)
+    time.sleep(random.uniform(0, min(cap, base * (2 ** attempt))))
+
+# Canvas collections whose next path segment is an id. Besides numbers these can be
+# SIS ids (courses/sis_course_id:ABC) or other free-form keys, so they are masked by position.
+ID_COLLECTIONS = {'accounts', 'content_migrations', 'courses', 'files', 'folders', 'migration_issues',
+                  'progress', 'quizzes', 'sections', 'users'}
+
+def _route_label(url):
+    """Low-cardinality label for a Canvas URL: ids become :id, pre-signed upload URLs collapse to one label."""
+    path = urllib.parse.urlparse(url).path
+    if not path.startswith(('/api/', '/login/')):
+        return 'file_upload'
+    segments = path.split('/')
+    for i in range(1, len(segments)):
+        if segments[i] and (segments[i - 1] in ID_COLLECTIONS or segments[i].isdigit()):
+            segments[i] = ':id'
+    return '/'.join(segments)
+
+def _observe(method, url, start, outcome):
+    elapsed = time.perf_counter() - start
+    metrics.observe('canvas_request_duration_seconds', elapsed, method=method, route=_route_label(url), status=outcome)
+    timing.add('canvas', elapsed)
+
+def _send(method, url, **kwargs):
+    """One attempt through the pooled session, timed for metrics and Server-Timing."""
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.exceptions.RequestException as e:
+        _observe(method, url, start, type(e).__name__)
+        raise
+    _observe(method, url, start, response.status_code)
+    return response
+
+def _never_connected(error):
+    """True if a ConnectionError was raised before the connection existed, i.e. nothing was sent."""
+    reason = error.args[0] if error.args else None
+    # requests wraps urllib3's MaxRetryError, whose reason is the underlying failure
+    return isinstance(getattr(reason, 'reason', reason), NewConnectionError)
+
+def _rewind(kwargs):
+    """Streams passed as `data` must be rewound before they can be sent again."""
+    data = kwargs.get('data')
+    if hasattr(data, 'seek'):
+        data.seek(0)
+
+def request(method, url, retries=None, **kwargs):
+    """
+    Sends a request to Canvas through the pooled session with connect/read timeouts
+    and bounded, jittered retries on connection errors, gateway 5xx responses and
+    rate-limit 403s. POSTs are only retried when Canvas cannot have acted on them:
+    failures to connect, 502/503 and rate limits. Calls are paced by the shared
+    rate-limit budget (see canvas_throttle). Returns the final requests.Response;
+    raises the underlying requests exception once retries are exhausted. Pointing
+    CANVAS_DOMAIN at a local stub exercises the same code path as production.
+    """
+    method = method.upper()
+    idempotent = method in IDEMPOTENT_METHODS
+    retry_statuses = IDEMPOTENT_RETRY_STATUSES if idempotent else RETRY_STATUSES
+    if retries is None:
+        retries = int(_env_float('CANVAS_HTTP_RETRIES', 2))
+    kwargs.setdefault('timeout', get_timeout())
+
+    for attempt in range(retries + 1):
+        last_attempt = attempt == retries
+        canvas_throttle.before_request(url, kwargs.get('headers'))
+        try:
+            response = _send(method, url, **kwargs)
+        except requests.exceptions.ConnectTimeout:
+            # Never connected, so nothing was sent
+            if last_attempt:
+                raise
+        except requests.exceptions.ReadTimeout:
+            # The request may have been processed; only replay it if that is harmless
+            if last_attempt or not idempotent:
+                raise
+        except requests.exceptions.ConnectionError as e:
+            # A dropped connection (e.g. RemoteDisconnected) may come after the body was
+            # sent and processed, so non-idempotent calls only retry failures to connect
+            if last_attempt or not (idempotent or _never_connected(e)):
+                raise
+        else:
+            canvas_throttle.after_response(url, kwargs.get('headers'), response)
+            # A rate-limited call was rejected before Canvas did any work, so it is always safe to replay
+            retryable = response.status_code in retry_statuses or canvas_throttle.is_rate_limited(response)
+            if last_attempt or not retryable:
+                return response
+            response.close()
+
+        _backoff(attempt)
+        _rewind(kwargs)
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
@@ -0,0 +1,78 @@
+import os
+from . import canvas_client, canvas_tokens
+from .multipart import MultipartStream
+
+class CanvasAuthError(Exception):
+    """Raised when Canvas rejects the access token (HTTP 401)."""
+
+def _noop_phase(phase):
+    pass
+
+def push_qti_package(course_id, title, package, package_size, token_source, on_phase=_noop_phase):
+    """
+    Creates a qti_converter content migration in the course and streams the zip in
+    `package` (a seekable file object positioned at the start of `package_size`
+    bytes) to its pre-attachment URL. `token_source` is a canvas_tokens.TokenSource;
+    an expired token is refreshed and the call retried once. Returns the migration's
+    progress_url. Raises CanvasAuthError on 401 and requests.exceptions.HTTPError on
+    other failures.
+    """
+    CANVAS_DOMAIN = os.getenv('CANVAS_DOMAIN')
+
+    # STEP 1: Initiate Content Migration
+    on_phase('creating_migration')
+    mig_url = f"{CANVAS_DOMAIN}/api/v1/courses/{course_id}/content_migrations"
+    mig_payload = {
+        'migration_type': 'qti_converter',
+        'pre_attachment': {
+            'name': f'{title}.zip',
+            'size': package_size,
+            'content_type': 'application/zip'
+        }
+    }
+
+    mig_res = canvas_tokens.authorized_request('POST', mig_url, token_source, json=mig_payload)
+
+    # Still 401 after a refresh attempt: the caller must ask for re-auth
+    if mig_res.status_code == 401:
+        raise CanvasAuthError("Canvas token expired. Please close and relaunch the tool.")
+
+    mig_res.raise_for_status()
+    migration_data = mig_res.json()
+
+    pre_auth = migration_data.get('pre_attachment', {})
+    upload_url = pre_auth.get('upload_url')
+    upload_params = pre_auth.get('upload_params', {})
+    progress_url = migration_data.get('progress_url')
+
+    if not upload_url:
+        raise Exception("Failed to receive upload_url from Canvas")
+
+    # STEP 2: Upload File Data
+    on_phase('uploading')
+    body = MultipartStream(upload_params, 'file', f'{title}.zip', package, package_size, 'application/zip')
+
+    # Upload the file without following redirects so we can explicitly handle
+    # the Canvas redirect behavior and surface real errors.
+    upload_res = canvas_client.post(
+        upload_url,
+        data=body,
+        headers={'Content-Type': body.content_type},
+        allow_redirects=False
+    )
+
+    if upload_res.status_code == 401:
+        raise CanvasAuthError("Canvas token expired during upload. Please close and relaunch the tool.")
+
+    # Treat 2xx as success and 3xx as the expected redirect handoff.
+    if 200 <= upload_res.status_code < 300:
+        pass
+    elif 300 <= upload_res.status_code < 400:
+        # Expected behavior: Canvas returns a redirect after a successful upload.
+        # We do not follow it here to avoid spurious 401s from downstream endpoints.
+        pass
+    else:
+        # Any other status is an error; raise so the caller's HTTPError handler can respond.
+        upload_res.raise_for_status()
+
+    return progress_url
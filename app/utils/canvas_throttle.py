@@ -0,0 +1,106 @@
+import hashlib
+import os
+import time
+import urllib.parse
+from flask import has_app_context
+from . import metrics
+
+# Canvas meters API use with a leaky bucket per access token: every request
+# costs X-Request-Cost units, X-Rate-Limit-Remaining reports what is left, and
+# callers that hit zero get 403 "Rate Limit Exceeded". The bucket refills over
+# time. The last reported budget is kept in the shared cache so every worker
+# process slows down together instead of discovering the limit independently.
+
+STATE_PREFIX = 'canvas_rl:'
+
+metrics.describe('canvas_throttle_decisions_total', 'counter',
+                 'Outbound Canvas calls by throttling decision (pass, delay, rate_limited).')
+metrics.describe('canvas_throttle_delay_seconds_total', 'counter',
+                 'Total time outbound Canvas calls were held back by the throttle.')
+metrics.describe('canvas_rate_limit_remaining', 'gauge',
+                 'Most recent X-Rate-Limit-Remaining reported by Canvas.')
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+def _bucket_key(url, headers):
+    """Cache key for the (domain, token) bucket, or None for calls Canvas does not meter (no bearer token)."""
+    auth = (headers or {}).get('Authorization', '')
+    if not auth.startswith('Bearer ') or not has_app_context():
+        return None
+    domain = urllib.parse.urlparse(url).netloc
+    token_hash = hashlib.sha256(auth[len('Bearer '):].encode('utf-8')).hexdigest()[:16]
+    return f"{STATE_PREFIX}{domain}:{token_hash}", domain
+
+def _estimated_remaining(state, now):
+    """Budget left now, assuming the bucket has been refilling since Canvas last reported it."""
+    refill = _env_float('CANVAS_RATE_LIMIT_REFILL', 10)
+    capacity = _env_float('CANVAS_RATE_LIMIT_CAPACITY', 700)
+    return min(capacity, state['remaining'] + refill * max(0.0, now - state['updated']))
+
+def before_request(url, headers):
+    """
+    Blocks until the shared budget for this token and domain can afford another call,
+    waiting at most CANVAS_THROTTLE_MAX_DELAY seconds. Returns the seconds waited.
+    """
+    bucket = _bucket_key(url, headers)
+    if bucket is None:
+        return 0.0
+    key, domain = bucket
+
+    from .. import cache
+    state = cache.get(key)
+    if not state:
+        metrics.inc('canvas_throttle_decisions_total', decision='pass', domain=domain)
+        return 0.0
+
+    # Keep enough headroom for the calls we expect to make next
+    floor = _env_float('CANVAS_RATE_LIMIT_FLOOR', 100) + state.get('cost', 1.0)
+    refill = _env_float('CANVAS_RATE_LIMIT_REFILL', 10)
+    remaining = _estimated_remaining(state, time.time())
+    if remaining >= floor:
+        metrics.inc('canvas_throttle_decisions_total', decision='pass', domain=domain)
+        return 0.0
+
+    delay = min(_env_float('CANVAS_THROTTLE_MAX_DELAY', 10), (floor - remaining) / refill)
+    metrics.inc('canvas_throttle_decisions_total', decision='delay', domain=domain)
+    metrics.inc('canvas_throttle_delay_seconds_total', delay, domain=domain)
+    time.sleep(delay)
+    return delay
+
+def is_rate_limited(response):
+    """Canvas signals an exhausted budget with 403 and a 'Rate Limit Exceeded' body."""
+    return response.status_code == 403 and 'rate limit exceeded' in response.text.lower()
+
+def after_response(url, headers, response):
+    """Records the budget Canvas reported so every worker sharing the cache sees it."""
+    bucket = _bucket_key(url, headers)
+    if bucket is None:
+        return
+    key, domain = bucket
+
+    remaining = response.headers.get('X-Rate-Limit-Remaining')
+    cost = response.headers.get('X-Request-Cost')
+    if is_rate_limited(response):
+        remaining = 0
+        metrics.inc('canvas_throttle_decisions_total', decision='rate_limited', domain=domain)
+    if remaining is None:
+        return
+
+    from .. import cache
+    previous = cache.get(key) or {}
+    try:
+        # Smooth the per-call cost so one expensive upload doesn't dominate the floor
+        new_cost = float(cost) if cost is not None else previous.get('cost', 1.0)
+        state = {
+            'remaining': float(remaining),
+            'cost': 0.7 * previous.get('cost', new_cost) + 0.3 * new_cost,
+            'updated': time.time(),
+        }
+    except ValueError:
+        return
+    cache.set(key, state, timeout=int(_env_float('CANVAS_RATE_LIMIT_STATE_TTL', 300)))
+    metrics.set_gauge('canvas_rate_limit_remaining', state['remaining'], domain=domain)
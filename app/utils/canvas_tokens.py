@@ -0,0 +1,137 @@
+import hashlib
+import os
+import time
+from flask import session
+from . import canvas_client, metrics
+from .singleflight import SingleFlight
+
+# Canvas OAuth tokens live in the shared cache, keyed by the session's job owner,
+# so the refresh token never reaches the browser and every worker (and every job
+# thread) sees a refreshed access token as soon as one is issued.
+
+TOKEN_PREFIX = 'canvas_token:'
+
+_flight = SingleFlight()
+
+metrics.describe('canvas_token_refreshes_total', 'counter',
+                 'Canvas OAuth refresh_token exchanges by outcome (ok, rejected, no_refresh_token).')
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+def _load(owner):
+    from .. import cache
+    return cache.get(TOKEN_PREFIX + owner) if owner else None
+
+def store(owner, token_data):
+    """Keeps the access/refresh tokens from a Canvas token response for `owner`. Returns the stored record."""
+    from .. import cache
+    previous = _load(owner) or {}
+    expires_in = token_data.get('expires_in')
+    record = {
+        'access_token': token_data['access_token'],
+        # Canvas only returns a refresh token with the authorization_code grant
+        'refresh_token': token_data.get('refresh_token') or previous.get('refresh_token'),
+        'expires_at': time.time() + float(expires_in) if expires_in else None,
+    }
+    cache.set(TOKEN_PREFIX + owner, record, timeout=int(_env_float('CANVAS_TOKEN_STORE_TTL', 86400)))
+    return record
+
+def forget(owner):
+    from .. import cache
+    if owner:
+        cache.delete(TOKEN_PREFIX + owner)
+
+def _refresh(owner, rejected_token):
+    record = _load(owner)
+    if not record or not record.get('refresh_token'):
+        metrics.inc('canvas_token_refreshes_total', outcome='no_refresh_token')
+        return None
+    # Another thread or worker refreshed while we were waiting
+    if record['access_token'] != rejected_token:
+        return record['access_token']
+
+    CANVAS_DOMAIN = os.getenv('CANVAS_DOMAIN')
+    response = canvas_client.post(f"{CANVAS_DOMAIN}/login/oauth2/token", data={
+        'grant_type': 'refresh_token',
+        'client_id': os.getenv('CANVAS_API_CLIENT_ID'),
+        'client_secret': os.getenv('CANVAS_API_CLIENT_SECRET'),
+        'refresh_token': record['refresh_token'],
+    })
+    try:
+        token_data = response.json() if response.ok else {}
+    except ValueError:
+        token_data = {}
+    if 'access_token' not in token_data:
+        # The refresh token was revoked (or the developer key changed): the user has to authorize again
+        metrics.inc('canvas_token_refreshes_total', outcome='rejected')
+        forget(owner)
+        return None
+
+    metrics.inc('canvas_token_refreshes_total', outcome='ok')
+    return store(owner, token_data)['access_token']
+
+class TokenSource:
+    """
+    The Canvas access token of one session. It reads the shared store on every use,
+    so a job that outlives a refresh picks up the new token. Without an owner (or a
+    stored record) it simply hands out the token it was created with.
+    """
+    def __init__(self, owner, access_token):
+        self.owner = owner
+        self.access_token = access_token
+
+    def get(self):
+        record = _load(self.owner)
+        if record is None:
+            return self.access_token
+        # Refresh slightly ahead of expiry rather than waiting for Canvas to reject the call
+        expires_at = record.get('expires_at')
+        if expires_at and expires_at - time.time() < _env_float('CANVAS_TOKEN_REFRESH_SKEW', 60):
+            return self.refresh(record['access_token']) or record['access_token']
+        return record['access_token']
+
+    def scope(self):
+        """Whose token this is, for keying per-user state: the session's owner key, or a digest of the token."""
+        return self.owner or hashlib.sha256(self.access_token.encode('utf-8')).hexdigest()
+
+    def refresh(self, rejected_token):
+        """
+        Exchanges the stored refresh token for a new access token. Concurrent callers
+        for the same session share one exchange. Returns the new token, or None when
+        the session has to re-authorize. Raises requests.exceptions.RequestException
+        if Canvas cannot be reached.
+        """
+        if not self.owner:
+            return None
+        return _flight.do(self.owner, lambda: _refresh(self.owner, rejected_token))
+
+def for_session():
+    """TokenSource for the current session, or None if it never completed Canvas OAuth."""
+    access_token = session.get('canvas_api_token')
+    if not access_token:
+        return None
+    return TokenSource(session.get('job_owner'), access_token)
+
+def authorized_request(method, url, token_source, **kwargs):
+    """
+    canvas_client.request with the session's bearer token. A 401 refreshes the token
+    and retries the call once; if no refresh is possible the 401 response is returned.
+    """
+    headers = dict(kwargs.pop('headers', None) or {})
+    token = token_source.get()
+    response = canvas_client.request(method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs)
+    if response.status_code != 401:
+        return response
+
+    new_token = token_source.refresh(token)
+    if not new_token:
+        return response
+    response.close()
+    data = kwargs.get('data')
+    if hasattr(data, 'seek'):
+        data.seek(0)
+    return canvas_client.request(method, url, headers={**headers, "Authorization": f"Bearer {new_token}"}, **kwargs)
@@ -0,0 +1,71 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from . import admission
+
+# Async I/O mode. Run gunicorn with GUNICORN_WORKER_CLASS=gevent and the worker
+# monkey-patches sockets, so every request and job becomes a greenlet and the
+# pooled requests session in canvas_client waits on Canvas cooperatively: one
+# worker can hold hundreds of in-flight Canvas calls (/api/canvas jobs,
+# /api/proxy/progress, the OAuth callback) instead of one per thread.
+#
+# Greenlets share one OS thread, so CPU-bound work (file extraction, parsing,
+# export, zipping) would stall every other request. run() hands it to a pool of
+# native threads instead. Under the default gthread worker it calls straight
+# through.
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def cooperative():
+    """True when running under a gevent-patched worker."""
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('socket')
+
+def _get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                from gevent.threadpool import ThreadPool
+                size = int(os.getenv('CPU_EXECUTOR_THREADS') or os.getenv('ADMISSION_CONCURRENCY') or 2)
+                _pool, _pool_pid = ThreadPool(max(1, size)), pid
+    return _pool
+
+def run(fn, *args):
+    """
+    Calls fn(*args) for CPU-bound work. In async mode it runs on a native thread
+    (with the caller's request context and remaining CPU budget) while the calling
+    greenlet yields; otherwise it is a plain call.
+    """
+    if not cooperative():
+        return fn(*args)
+
+    context = contextvars.copy_context()
+    budget = admission.handoff_budget()
+    spent = [0.0]
+
+    def call():
+        # Exceptions are handed back rather than raised, which gevent would log as a crash
+        start = time.thread_time()
+        try:
+            if budget is None:
+                return context.run(fn, *args), None
+            with admission.cpu_budget(budget):
+                return context.run(fn, *args), None
+        except Exception as e:
+            return None, e
+        finally:
+            spent[0] = time.thread_time() - start
+
+    result, error = _get_pool().apply(call)
+    admission.charge(spent[0])
+    if error is not None:
+        raise error
+    return result
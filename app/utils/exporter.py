@@ -1,7 +1,11 @@
 import xml.etree.ElementTree as ET
+import io
 import re
 import random
+import zipfile
 import xml.dom.minidom
+from .admission import check
+from .timing import phase
 
 def _safe_var_ident(var, index):
     """Convert a FMB variable name to a safe QTI identifier.
@@ -285,23 +289,41 @@ def create_qti_1_2_package(quiz_title, parsed_data):
     section = ET.SubElement(assessment, 'section', {'ident': 'root_section'})
 
     # --- ROUTER LOGIC ---
-    for question in parsed_data:
-        q_type = question.get("type")
+    with phase('build_xml'):
+        for question in parsed_data:
+            check()
+            q_type = question.get("type")
         
-        if q_type in ["multiple_choice_question", "true_false_question"]:
-            _create_mcq_item(section, question)
-        elif q_type == "short_answer_question":
-            _create_short_answer_item(section, question)
-        elif q_type == "fill_in_multiple_blanks_question":
-            _create_fmb_item(section, question)
-        elif q_type == "multiple_answers_question":
-            _create_multi_answer_item(section, question)
-        elif q_type == "essay_question":
-            _create_essay_item(section, question)
-        else:
-            print(f"Warning: Unknown question type '{q_type}' - skipping.")
+            if q_type in ["multiple_choice_question", "true_false_question"]:
+                _create_mcq_item(section, question)
+            elif q_type == "short_answer_question":
+                _create_short_answer_item(section, question)
+            elif q_type == "fill_in_multiple_blanks_question":
+                _create_fmb_item(section, question)
+            elif q_type == "multiple_answers_question":
+                _create_multi_answer_item(section, question)
+            elif q_type == "essay_question":
+                _create_essay_item(section, question)
+            else:
+                print(f"Warning: Unknown question type '{q_type}' - skipping.")
 
     # Convert to string and return
-    rough_string = ET.tostring(qti_root, xml_declaration=True, encoding='UTF-8')
-    reparsed = xml.dom.minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="  ")
+    with phase('pretty_print'):
+        rough_string = ET.tostring(qti_root, xml_declaration=True, encoding='UTF-8')
+        reparsed = xml.dom.minidom.parseString(rough_string)
+        return reparsed.toprettyxml(indent="  ")
+
+def write_qti_zip(fileobj, qti_package, chunk_chars=64 * 1024):
+    """Writes a QTI XML document into `fileobj` as a zip package, encoding it in chunks
+    so the UTF-8 bytes are never held in memory all at once."""
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        with zip_file.open("quiz.qti.xml", "w") as entry:
+            for start in range(0, len(qti_package), chunk_chars):
+                entry.write(qti_package[start:start + chunk_chars].encode("utf-8"))
+
+def package_qti_zip(qti_package):
+    """Zips a QTI XML document into an in-memory package, rewound and ready to read."""
+    zip_buffer = io.BytesIO()
+    write_qti_zip(zip_buffer, qti_package)
+    zip_buffer.seek(0)
+    return zip_buffer
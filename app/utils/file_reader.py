@@ -1,14 +1,21 @@
 import io
+from .admission import check
 
-def read_file(file):
+def iter_read_file(file):
+    """
+    Extracts the text of an uploaded quiz file. For PDFs it yields (pages_done,
+    pages_total) after every page; the text is the generator's return value.
+    """
     if file.content_type == "application/pdf":
         import fitz
         file_bytes = file.read()
         doc = fitz.open(stream=file_bytes, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+        parts = []
+        for page_number, page in enumerate(doc, 1):
+            check()
+            parts.append(page.get_text())
+            yield page_number, doc.page_count
+        return "".join(parts)
     elif file.content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
         from docx import Document
         file_bytes = file.read()
@@ -18,3 +25,11 @@ def read_file(file):
         return text
     else:
         return file.read().decode('utf-8')
+
+def read_file(file):
+    reader = iter_read_file(file)
+    while True:
+        try:
+            next(reader)
+        except StopIteration as finished:
+            return finished.value
@@ -0,0 +1,200 @@
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, session
+
+JOB_KEY_PREFIX = 'job:'
+IDEMPOTENCY_PREFIX = 'job_idem:'
+# Rounds of claim-or-replay before submit_job_once gives up under contention
+IDEMPOTENCY_CLAIM_ATTEMPTS = 5
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+class JobQueueFull(Exception):
+    """Raised when the worker pool already holds as many jobs as it is allowed to queue."""
+
+class JobClaimConflict(Exception):
+    """Raised when concurrent retries keep taking an idempotency key from each other."""
+
+class JobError(Exception):
+    """Raised inside a job to fail it with a user-facing message and HTTP-style status code."""
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+# --- Job records (stored in the shared Flask cache so any worker can report status) ---
+
+def _job_ttl():
+    return int(os.getenv('JOB_TTL', '3600'))
+
+def _save(record):
+    from .. import cache
+    record['updated_at'] = time.time()
+    cache.set(JOB_KEY_PREFIX + record['id'], record, timeout=_job_ttl())
+
+def get_job(job_id):
+    from .. import cache
+    return cache.get(JOB_KEY_PREFIX + job_id)
+
+def owner_key():
+    """Random per-session identifier used to scope jobs to the browser session that created them."""
+    if 'job_owner' not in session:
+        session['job_owner'] = secrets.token_hex(16)
+    return session['job_owner']
+
+def public_view(record):
+    """The job record as returned to clients (without the owner key)."""
+    return {key: value for key, value in record.items() if key != 'owner'}
+
+class Job:
+    """Handle passed to job functions so they can report which phase they are in."""
+    def __init__(self, record):
+        self.record = record
+
+    @property
+    def id(self):
+        return self.record['id']
+
+    def set_phase(self, phase, **fields):
+        started = self.record['created_at']
+        self.record['phase'] = phase
+        self.record['phases'].append({'name': phase, 'at': round(time.time() - started, 3)})
+        self.record.update(fields)
+        _save(self.record)
+
+    def update(self, **fields):
+        self.record.update(fields)
+        _save(self.record)
+
+def _run(app, job, fn, args, kwargs):
+    with app.app_context():
+        job.set_phase('running', status='running')
+        try:
+            result = fn(job, *args, **kwargs)
+        except JobError as e:
+            job.set_phase('failed', status='failed', error=e.message, status_code=e.status_code)
+        except Exception as e:
+            current_app.logger.exception("Job %s (%s) failed", job.id, job.record.get('kind'))
+            job.set_phase('failed', status='failed', error=f"Internal Server Error: {str(e)}", status_code=500)
+        else:
+            job.set_phase('succeeded', status='succeeded', result=result)
+
+# --- Backends ---
+
+class InlineBackend:
+    """Runs the job in the calling thread. Used on serverless hosts where threads die with the response."""
+    def submit(self, run):
+        run()
+
+class ThreadPoolBackend:
+    """Bounded in-process worker pool; rejects new jobs once `queue_size` are pending or running."""
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+    def submit(self, run):
+        if not self.slots.acquire(blocking=False):
+            raise JobQueueFull()
+        future = self.executor.submit(run)
+        future.add_done_callback(lambda _: self.slots.release())
+
+BACKENDS = {
+    'inline': lambda: InlineBackend(),
+    'thread': lambda: ThreadPoolBackend(
+        workers=int(os.getenv('JOB_WORKERS', '4')),
+        queue_size=int(os.getenv('JOB_QUEUE_SIZE', '16')),
+    ),
+}
+
+_backend = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Returns the process-wide backend chosen by JOB_BACKEND (defaults to inline on Vercel)."""
+    global _backend, _backend_pid
+    pid = os.getpid()
+    if _backend is None or _backend_pid != pid:
+        with _backend_lock:
+            if _backend is None or _backend_pid != pid:
+                default = 'inline' if os.getenv('VERCEL') else 'thread'
+                name = os.getenv('JOB_BACKEND', default)
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown JOB_BACKEND '{name}'. Expected one of: {', '.join(BACKENDS)}")
+                _backend, _backend_pid = BACKENDS[name](), pid
+    return _backend
+
+def _submit(job_id, kind, fn, args, kwargs):
+    now = time.time()
+    record = {
+        'id': job_id,
+        'kind': kind,
+        'owner': owner_key(),
+        'status': 'queued',
+        'phase': 'queued',
+        'phases': [{'name': 'queued', 'at': 0}],
+        'result': None,
+        'error': None,
+        'created_at': now,
+    }
+    _save(record)
+
+    job = Job(record)
+    app = current_app._get_current_object()
+    try:
+        get_backend().submit(lambda: _run(app, job, fn, args, kwargs))
+    except JobQueueFull:
+        from .. import cache
+        cache.delete(JOB_KEY_PREFIX + record['id'])
+        raise
+    return get_job(record['id']) or record
+
+def submit_job(kind, fn, *args, **kwargs):
+    """
+    Records a new job and hands it to the configured backend. `fn` is called as
+    fn(job, *args, **kwargs) inside an app context; its return value becomes the
+    job result. Returns the job record as stored right after submission.
+    Raises JobQueueFull when the pool cannot accept more work.
+    """
+    return _submit(secrets.token_urlsafe(12), kind, fn, args, kwargs)
+
+def submit_job_once(idempotency_key, window, kind, fn, *args, replayable=None, **kwargs):
+    """
+    Like submit_job, but a repeat with the same `idempotency_key` within `window`
+    seconds returns the job the first call started instead of starting another.
+    A retry is allowed instead if that job failed, or if `replayable(job)` returns
+    False for it (e.g. the work it handed off failed later, outside the job).
+    Returns (job, replayed). A job is only ever started by the caller holding the
+    key; raises JobClaimConflict if no claim or replayable job turns up in
+    IDEMPOTENCY_CLAIM_ATTEMPTS rounds.
+    """
+    from .. import cache
+    key = IDEMPOTENCY_PREFIX + idempotency_key
+    job_id = secrets.token_urlsafe(12)
+
+    for _ in range(IDEMPOTENCY_CLAIM_ATTEMPTS):
+        # cache.add only succeeds for the first caller, so concurrent duplicates cannot both start a job
+        if cache.add(key, job_id, timeout=window):
+            try:
+                return _submit(job_id, kind, fn, args, kwargs), False
+            except JobQueueFull:
+                cache.delete(key)
+                raise
+
+        existing_id = cache.get(key)
+        if existing_id is None:
+            continue
+        existing = get_job(existing_id)
+        if existing is None:
+            # Claimed a moment ago and not recorded yet
+            return {'id': existing_id, 'status': 'queued', 'phase': 'queued', 'result': None, 'error': None}, True
+        if existing['status'] != 'failed' and (replayable is None or replayable(existing)):
+            return existing, True
+        # Only clear the key if it still names the dead job, not one a concurrent retry just started
+        if cache.get(key) == existing_id:
+            cache.delete(key)
+
+    raise JobClaimConflict()
@@ -2,9 +2,17 @@ import os
 import tempfile
 import json
 import shutil
+import hashlib
+import threading
+import time
+import functools
+from datetime import datetime
 from flask import current_app
 from pylti1p3.contrib.flask import FlaskMessageLaunch, FlaskCacheDataStorage
 from pylti1p3.registration import Registration
+from pylti1p3.tool_config import ToolConfJsonFile
+from pylti1p3.exception import LtiException
+from . import platform_keys
 
 class ExtendedFlaskMessageLaunch(FlaskMessageLaunch):
     def validate_nonce(self):
@@ -19,12 +27,37 @@ class ExtendedFlaskMessageLaunch(FlaskMessageLaunch):
             return self
         return super().validate_nonce()
 
+class CachedKeyMessageLaunch(FlaskMessageLaunch):
+    """
+    FlaskMessageLaunch with standard validation, except that the platform's signing
+    key comes from the per-process platform key cache. Used by /launch/.
+    """
+    def get_public_key(self):
+        """Looks the signing key up in the per-process platform key cache instead of fetching the key set per launch."""
+        if self._registration.get_key_set():
+            return super().get_public_key()
+        header = self._jwt.get('header', {})
+        kid, alg = header.get('kid'), header.get('alg')
+        if not kid:
+            raise LtiException("JWT KID not found")
+        if not alg:
+            raise LtiException("JWT ALG not found")
+        key_set_url = self._registration.get_key_set_url()
+        if not key_set_url or not key_set_url.startswith(("http://", "https://")):
+            raise LtiException("Invalid URL: " + str(key_set_url))
+        issuer = self._jwt.get('body', {}).get('iss')
+        return platform_keys.get_public_key(issuer, key_set_url, kid, alg)
+
+def get_config_dir():
+    """Directory holding config.json and the tool keys; LTI_CONFIG_DIR overrides app/config."""
+    return os.getenv('LTI_CONFIG_DIR') or os.path.join(current_app.root_path, 'config')
+
 def get_lti_config_path():
-    base_path = current_app.root_path
-    config_path = os.path.join(base_path, 'config', 'config.json')
+    config_dir = get_config_dir()
+    config_path = os.path.join(config_dir, 'config.json')
     
     # Check if we are in a serverless/Vercel env (missing private key on disk)
-    private_key_path = os.path.join(base_path, 'config', 'private.key')
+    private_key_path = os.path.join(config_dir, 'private.key')
     
     if not os.path.exists(private_key_path):
         env_key = os.environ.get("LTI_PRIVATE_KEY")
@@ -35,7 +68,7 @@ def get_lti_config_path():
             
             # 1. Write Keys to /tmp
             with open(tmp_priv_path, 'w') as f: f.write(env_key)
-            src_pub_path = os.path.join(base_path, 'config', 'public.key')
+            src_pub_path = os.path.join(config_dir, 'public.key')
             if os.path.exists(src_pub_path):
                 shutil.copy2(src_pub_path, tmp_pub_path)
             
@@ -75,13 +108,134 @@ def create_ephemeral_config(original_path, actual_priv_path, actual_pub_path):
         
     return tmp_config_path
 
+_tool_conf = None
+_tool_conf_fingerprint = None
+_tool_conf_lock = threading.Lock()
+
+def _config_fingerprint(config_dir):
+    """Cheap summary of everything get_lti_config_path reads; changes whenever one of its inputs does."""
+    parts = []
+    for name in ('config.json', 'private.key', 'public.key'):
+        try:
+            stat = os.stat(os.path.join(config_dir, name))
+            parts.append((name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            parts.append((name, None, None))
+    env_key = os.environ.get("LTI_PRIVATE_KEY") or ''
+    parts.append(hashlib.sha256(env_key.encode('utf-8')).hexdigest())
+    parts.append(os.getenv('CANVAS_DOMAIN'))
+    return tuple(parts)
+
+def get_tool_conf():
+    """
+    Returns the process-wide ToolConfJsonFile, building it on first use. It is only
+    rebuilt (and the serverless /tmp copies only rewritten) when config.json, the key
+    files, LTI_PRIVATE_KEY or CANVAS_DOMAIN change.
+    """
+    global _tool_conf, _tool_conf_fingerprint
+    fingerprint = _config_fingerprint(get_config_dir())
+    if _tool_conf is None or _tool_conf_fingerprint != fingerprint:
+        with _tool_conf_lock:
+            if _tool_conf is None or _tool_conf_fingerprint != fingerprint:
+                _tool_conf = ToolConfJsonFile(get_lti_config_path())
+                _tool_conf_fingerprint = fingerprint
+    return _tool_conf
+
 def get_launch_data_storage():
     from .. import cache
     return FlaskCacheDataStorage(cache)
 
+@functools.lru_cache(maxsize=16)
+def _jwk_from_file(key_path, mtime_ns):
+    # mtime is part of the cache key so a replaced key file is picked up
+    with open(key_path, 'r') as key_file:
+        return Registration.get_jwk(key_file.read())
+
 def get_jwk_from_public_key(key_name):
-    key_path = os.path.join(current_app.root_path, 'config', key_name)
-    with open(key_path, 'rb') as key_file:
-        public_key = key_file.read()
-        jwk = Registration.get_jwk(public_key)
-        return jwk
+    key_path = os.path.join(get_config_dir(), key_name)
+    return dict(_jwk_from_file(key_path, os.stat(key_path).st_mtime_ns))
+
+# --- JWKS document (tool public keys, including retired keys during rotation) ---
+
+PREVIOUS_PUBLIC_KEY_FILE = 'previous_public.key'
+
+_jwks_cache = {}
+_jwks_lock = threading.Lock()
+_warned_overlap_values = set()
+
+def _overlap_active():
+    """
+    True while retired keys should still be published. LTI_KEY_OVERLAP_UNTIL takes a
+    unix timestamp or ISO-8601 datetime; when unset, retired keys are published for as
+    long as they are configured. A value that parses as neither counts as expired.
+    """
+    until = os.getenv('LTI_KEY_OVERLAP_UNTIL')
+    if not until:
+        return True
+    try:
+        deadline = float(until)
+    except ValueError:
+        try:
+            deadline = datetime.fromisoformat(until).timestamp()
+        except ValueError:
+            if until not in _warned_overlap_values:
+                _warned_overlap_values.add(until)
+                current_app.logger.warning(
+                    "Ignoring malformed LTI_KEY_OVERLAP_UNTIL %r; retired keys are no longer published", until)
+            return False
+    return time.time() < deadline
+
+def _previous_public_keys(config_dir):
+    """PEM public keys from before the last rotation (LTI_PREVIOUS_PUBLIC_KEY and/or config/previous_public.key)."""
+    keys = []
+    env_key = os.environ.get("LTI_PREVIOUS_PUBLIC_KEY")
+    if env_key:
+        keys.append(env_key)
+    key_path = os.path.join(config_dir, PREVIOUS_PUBLIC_KEY_FILE)
+    if os.path.exists(key_path):
+        with open(key_path, 'r') as f:
+            keys.append(f.read())
+    return keys
+
+def get_jwks_document():
+    """
+    Returns (body, etag) for the tool's JWKS. The document is serialized once per key
+    set: current keys come from the memoized tool config, and retired keys are added
+    while the rotation overlap window is open so platforms can still verify tokens
+    signed before the switch.
+    """
+    config_dir = get_config_dir()
+    tool_conf = get_tool_conf()
+    previous_path = os.path.join(config_dir, PREVIOUS_PUBLIC_KEY_FILE)
+    try:
+        previous_stat = os.stat(previous_path)
+        previous_file = (previous_stat.st_mtime_ns, previous_stat.st_size)
+    except OSError:
+        previous_file = None
+    previous_env = hashlib.sha256((os.environ.get("LTI_PREVIOUS_PUBLIC_KEY") or '').encode('utf-8')).hexdigest()
+    cache_key = (id(tool_conf), previous_file, previous_env, _overlap_active())
+
+    cached = _jwks_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with _jwks_lock:
+        cached = _jwks_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        keys = list(tool_conf.get_jwks()['keys'])
+        if cache_key[-1]:
+            seen = {key.get('kid') for key in keys}
+            for pem in _previous_public_keys(config_dir):
+                jwk = Registration.get_jwk(pem)
+                if jwk.get('kid') not in seen:
+                    seen.add(jwk.get('kid'))
+                    keys.append(jwk)
+
+        body = json.dumps({'keys': keys}, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        # Only the current key set is ever requested again
+        _jwks_cache.clear()
+        _jwks_cache[cache_key] = (body, etag)
+        return body, etag
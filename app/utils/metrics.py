@@ -0,0 +1,88 @@
+import bisect
+import threading
+
+# In-process metrics rendered in the Prometheus text exposition format.
+# Values are per worker process; Prometheus aggregates across scrape targets.
+# Recording is a dict update under a lock; all formatting happens at scrape time.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_meta = {}        # name -> (type, help)
+_values = {}      # (name, labels) -> float
+_buckets = {}     # histogram name -> upper bounds
+_histograms = {}  # (name, labels) -> [count per bucket..., count above the last bound, sum]
+
+def describe(name, metric_type, help_text, buckets=None):
+    """Registers a metric's TYPE and HELP lines (and a histogram's bucket bounds). Call at import time."""
+    _meta[name] = (metric_type, help_text)
+    if metric_type == 'histogram':
+        _buckets[name] = tuple(sorted(buckets or DEFAULT_BUCKETS))
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name, amount=1.0, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        _values[key] = _values.get(key, 0.0) + amount
+
+def set_gauge(name, value, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        _values[key] = float(value)
+
+def observe(name, value, **labels):
+    """Records one sample in a histogram registered with describe(..., 'histogram')."""
+    buckets = _buckets.get(name, DEFAULT_BUCKETS)
+    index = bisect.bisect_left(buckets, value)
+    key = (name, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        histogram[index] += 1
+        histogram[-1] += value
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+def _format_value(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+def _histogram_lines(name, labels, histogram):
+    buckets = _buckets.get(name, DEFAULT_BUCKETS)
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets + (None,), histogram[:-1]):
+        cumulative += count
+        le = '+Inf' if bound is None else repr(float(bound))
+        lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram[-1])}')
+    lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return lines
+
+def render():
+    """Returns every metric as Prometheus text, grouped by metric name."""
+    with _lock:
+        values = sorted(_values.items())
+        histograms = sorted((key, list(histogram)) for key, histogram in _histograms.items())
+    samples = {}
+    for (name, labels), value in values:
+        samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for (name, labels), histogram in histograms:
+        samples.setdefault(name, []).extend(_histogram_lines(name, labels, histogram))
+
+    lines = []
+    for name in sorted(samples):
+        metric_type, help_text = _meta.get(name, ('untyped', ''))
+        if help_text:
+            lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(samples[name])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,80 @@
+import secrets
+
+CHUNK_SIZE = 64 * 1024
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\r', '').replace('\n', '')
+
+class MultipartStream:
+    """
+    Streaming multipart/form-data body: text fields followed by a single file part
+    read straight from `fileobj`. Exposes `len` so requests sends a Content-Length
+    instead of chunked encoding (which S3-style upload targets reject), and reads
+    the file in CHUNK_SIZE pieces so memory stays flat regardless of file size.
+    `seek(0)` rewinds the whole body so a failed upload can be retried.
+    """
+    def __init__(self, fields, file_field, filename, fileobj, file_size, file_content_type='application/octet-stream'):
+        self.boundary = secrets.token_hex(16)
+        self.fileobj = fileobj
+        self.file_size = file_size
+        self.file_start = fileobj.tell()
+
+        head = []
+        for name, value in (fields or {}).items():
+            head.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{_escape(name)}"\r\n\r\n'
+                f'{value}\r\n'
+            )
+        # Upload targets such as S3 require the file to be the last field
+        head.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_escape(file_field)}"; filename="{_escape(filename)}"\r\n'
+            f'Content-Type: {file_content_type}\r\n\r\n'
+        )
+        self.head = ''.join(head).encode('utf-8')
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self.len = len(self.head) + file_size + len(self.tail)
+        self.position = 0
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        if offset != 0 or whence != 0:
+            raise ValueError("MultipartStream can only be rewound to the start")
+        self.fileobj.seek(self.file_start)
+        self.position = 0
+        return 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.len - self.position
+        out = []
+        while size > 0 and self.position < self.len:
+            head_end = len(self.head)
+            file_end = head_end + self.file_size
+            if self.position < head_end:
+                piece = self.head[self.position:self.position + size]
+            elif self.position < file_end:
+                piece = self.fileobj.read(min(size, file_end - self.position))
+                if not piece:
+                    raise IOError("File ended before its declared size")
+            else:
+                offset = self.position - file_end
+                piece = self.tail[offset:offset + size]
+            out.append(piece)
+            self.position += len(piece)
+            size -= len(piece)
+        return b''.join(out)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
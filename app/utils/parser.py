@@ -1,4 +1,6 @@
+import functools
 import re
+from .admission import check
 from .text_utils import extract_points, _clean_points_text
 from .respondus_parser import (
     detect_respondus_format, 
@@ -7,7 +9,12 @@ from .respondus_parser import (
     parse_respondus_essay,
     parse_respondus_fib,
     parse_respondus_fmb,
-    parse_respondus_mr
+    parse_respondus_mr,
+    check_respondus_mcq,
+    check_respondus_tf,
+    check_respondus_fib,
+    check_respondus_fmb,
+    check_respondus_mr,
 )
 
 # --- Core Branch Parsers ---
@@ -233,13 +240,8 @@ def _parse_essay(line, index):
         "points": points
     }
 
-def _parse_core_fmb(line, index):
-    """
-    Parses a Core-style Fill-in-Multiple-Blanks.
-    Syntax: The [a] is [b]. a: red, b: blue
-    """
-    points = extract_points(line)
-    
+def _split_core_fmb(line):
+    """(parts, question_text, kv_pairs, variables) of a Core-style FMB line. No variables: not an FMB."""
     # Split question from answers
     # Use a separator like ":" or "Answers:"
     parts = re.split(r'Answers?:', line, flags=re.IGNORECASE)
@@ -255,6 +257,21 @@ def _parse_core_fmb(line, index):
     
     # Extract variables
     variables = re.findall(r'\[([^\]]+)\]', question_text)
+    return parts, question_text, kv_pairs, variables
+
+def _missing_core_fmb_answers(parts, kv_pairs, variables):
+    if len(parts) < 2:
+        return []  # AUTO-BLANK: the bracketed words are the answers
+    keys = {pair.split(':', 1)[0].strip().lower() for pair in kv_pairs if ':' in pair}
+    return [var for var in variables if var.lower() not in keys]
+
+def _parse_core_fmb(line, index):
+    """
+    Parses a Core-style Fill-in-Multiple-Blanks.
+    Syntax: The [a] is [b]. a: red, b: blue
+    """
+    points = extract_points(line)
+    parts, question_text, kv_pairs, variables = _split_core_fmb(line)
     if not variables:
         return None # Not an FMB
 
@@ -295,101 +312,275 @@ def _parse_core_fmb(line, index):
         "points": points
     }
 
-def parse_quiz_text(text_input):
+# --- Validation checks ---
+# (type, error) of the matching branch parser, without building the answers.
+
+def _check_multiple_choice(lines):
+    full_text = " ".join(lines)
+    answer_match = re.search(r'Answers?:\s*([A-Z, ]+)', full_text, re.IGNORECASE)
+    correct_chars = set()
+    if answer_match:
+        correct_chars.update(c.strip() for c in re.split(r'[, ]+', answer_match.group(1).upper()) if c.strip())
+
+    option_chars = []
+    for line in lines:
+        match = re.match(r'^(\*?)([A-Z])[\)\.]\s*(.*)', line.strip(), re.IGNORECASE)
+        if match:
+            option_chars.append(match.group(2).upper())
+            if match.group(1):
+                correct_chars.add(match.group(2).upper())
+    if len(option_chars) < 2:
+        return "error", "Insufficient options found. List at least two options starting with 'A)', 'B)', etc."
+
+    question_lines = []
+    for line in lines:
+        if re.match(r'^\*?[A-Z][\)\.]', line.strip(), re.IGNORECASE):
+            break
+        question_lines.append(line)
+    if not _clean_points_text(" ".join(question_lines).strip()):
+        return "error", "Question text is missing."
+
+    correct = sum(1 for char in option_chars if char in correct_chars)
+    if not correct:
+        return "error", "No correct answer specified. Use 'Answer: A' or mark choices with '*'."
+    return ("multiple_answers_question" if correct > 1 else "multiple_choice_question"), None
+
+def _check_true_false(lines):
+    clean_text = re.sub(r'^(?:TF:|True/False:)\s*', '', " ".join(lines), flags=re.IGNORECASE)
+    if not re.search(r'Answer:\s*(T|True|F|False)', clean_text, re.IGNORECASE):
+        return "error", "Missing or Invalid Answer. Ensure the question ends with 'Answer: True' or 'Answer: False'."
+    question_part = re.split(r'Answer:', clean_text, flags=re.IGNORECASE)[0].strip()
+    question_part = re.sub(r'\((?:T/F|True/False)\)', '', question_part, flags=re.IGNORECASE)
+    if not _clean_points_text(question_part):
+        return "error", "Question text is empty."
+    return "true_false_question", None
+
+def _check_short_answer(line):
+    clean_line = re.sub(r'^(?:SA:|Short Answer:)\s*', '', line, flags=re.IGNORECASE)
+    parts = re.split(r'Answer:', clean_line, flags=re.IGNORECASE)
+    if len(parts) < 2:
+        return "error", "Missing 'Answer:'. Short Answer questions must end with 'Answer: [Your Answer]'."
+    if not parts[1].strip():
+        return "error", "Answer content is empty."
+    return "short_answer_question", None
+
+def _check_fill_in_the_blank(line):
+    parts = re.split(r'Answer:', line, flags=re.IGNORECASE)
+    if len(parts) < 2:
+        return "error", "Missing 'Answer:'. Fill-in-the-blank questions must end with 'Answer: [word]'."
+    if not re.search(r'_{2,}', parts[0].strip()):
+        return "error", "No blank found. Use underscores (e.g., '_____') to indicate where the blank should be."
+    return "short_answer_question", None
+
+def _check_essay(line):
+    clean_line = re.sub(r'^(?:Essay:)\s*', '', line, flags=re.IGNORECASE)
+    if not _clean_points_text(re.sub(r'\[Essay\]', '', clean_line, flags=re.IGNORECASE)):
+        return "error", "Essay question text is empty."
+    return "essay_question", None
+
+def _check_core_fmb(line):
+    parts, _, kv_pairs, variables = _split_core_fmb(line)
+    missing_vars = _missing_core_fmb_answers(parts, kv_pairs, variables)
+    if missing_vars:
+        return "error", f"Missing answers for bracketed variables: {', '.join(missing_vars)}. Each variable like [blank] must have a matching 'blank: answer' in the Answers section."
+    return "fill_in_multiple_blanks_question", None
+
+_CHECKS = {
+    "respondus_MC": check_respondus_mcq,
+    "respondus_TF": check_respondus_tf,
+    "respondus_E": lambda lines: ("essay_question", None),
+    "respondus_F": check_respondus_fib,
+    "respondus_FMB": check_respondus_fmb,
+    "respondus_MR": check_respondus_mr,
+    "respondus_unsupported": lambda r_type: ("error", f"Unsupported Respondus type: {r_type}"),
+    "fmb": _check_core_fmb,
+    "tf": _check_true_false,
+    "sa": _check_short_answer,
+    "essay": _check_essay,
+    "fib": _check_fill_in_the_blank,
+    "mc": _check_multiple_choice,
+    "unrecognized": lambda error: ("error", error),
+}
+
+RESPONDUS_TYPES = {"MC": "MC", "TF": "TF", "E": "E", "ESSAY": "E", "F": "F", "FMB": "FMB", "MR": "MR"}
+
+def _unrecognized_hint(block, lines):
+    error_hint = "Format not recognized."
+    if re.search(r'\n[A-Z][\)\.]', "\n"+"\n".join(lines), re.IGNORECASE):
+        error_hint = "Looks like Multiple Choice, but check if the 'Answer:' line is correct."
+    elif re.search(r'_{1,}', block):
+        error_hint = "Looks like Fill-in-the-Blank, but check if 'Answer:' line is present."
+    elif "True" in block or "False" in block:
+        error_hint = "Looks like True/False. Ensure it ends with 'Answer: True' or 'Answer: False'."
+    return f"{error_hint} Please refer to the formatting guide."
+
+def _route_block(block):
     """
-    Correctly parses multi-line quiz questions from a single text block.
+    Picks the branch that handles one non-empty block. Returns (kind, argument, points),
+    where `argument` is what that branch is given (cleaned lines or the joined text).
+    Shared by the full parser and the validation checks so both classify alike.
     """
-    questions = []
-    # Split by one or more blank lines to correctly separate each question block
-    blocks = re.split(r'\n\s*\n', text_input.strip())
-    
-    for i, block in enumerate(blocks):
-        if not block.strip():
-            continue
-        
-        is_respondus = detect_respondus_format(block)
-        lines = [line.strip() for line in block.split('\n') if line.strip()]
-        points = extract_points(block)
+    lines = [line.strip() for line in block.split('\n') if line.strip()]
 
-        if is_respondus:
-            print(f"Parsing block {i} as Respondus Format")
-            # Detect subtype
-            type_match = re.search(r'^Type:\s*([A-Z]+)', block, re.IGNORECASE | re.MULTILINE)
-            r_type = type_match.group(1).upper() if type_match else "MC"
-            
-            # Legacy T/F check (not strictly 'Type: TF' but just *True/*False)
-            if r_type == "MC" and re.search(r'^\s*\*(True|False|T|F)\s*$', block, re.IGNORECASE | re.MULTILINE):
-                r_type = "TF"
-
-            # Pre-clean lines for Respondus: remove Type: and Points: and numbering
-            clean_lines = []
-            for line in lines:
-                l = line.strip()
-                if re.match(r'^(Type|Points):', l, re.IGNORECASE):
-                    continue
-                if re.match(r'^\d+[\.\)]\s+', l):
-                    l = re.sub(r'^\d+[\.\)]\s+', '', l)
-                clean_lines.append(l)
-
-            if r_type == "MC":
-                question_data = parse_respondus_mcq(clean_lines, i, points)
-            elif r_type == "TF":
-                question_data = parse_respondus_tf(clean_lines, i, points)
-            elif r_type in ["E", "ESSAY"]:
-                question_data = parse_respondus_essay(clean_lines, i, points)
-            elif r_type == "F":
-                question_data = parse_respondus_fib(clean_lines, i, points)
-            elif r_type == "FMB":
-                question_data = parse_respondus_fmb(clean_lines, i, points)
-            elif r_type == "MR":
-                question_data = parse_respondus_mr(clean_lines, i, points)
-            else:
-                question_data = {"id": f"error_{i}", "type": "error", "question_text": block, "error": f"Unsupported Respondus type: {r_type}"}
-        else:
-            # Fallback to Core Branch
-            print(f"Parsing block {i} as Core Format")
-            full_block_text = " ".join(lines)
-            full_lower = full_block_text.lower()
-            
-            # (Existing Router Logic)
-            if re.match(r'^\d+[\.\)]\s+', lines[0]):
-                lines[0] = re.sub(r'^\d+[\.\)]\s+', '', lines[0])
-                full_block_text = " ".join(lines)
-                full_lower = full_block_text.lower()
-            
-            # Check for Multiple Blanks first (Core)
-            fmb_data = _parse_core_fmb(full_block_text, i)
-            if fmb_data:
-                question_data = fmb_data
-            elif full_lower.startswith("tf:") or full_lower.startswith("true/false:"):
-                question_data = _parse_true_false(lines, i)
-            elif full_lower.startswith("sa:") or "[short answer]" in full_lower:
-                question_data = _parse_short_answer(full_block_text, i)
-            elif full_lower.startswith("essay:") or "[essay]" in full_lower:
-                question_data = _parse_essay(full_block_text, i)
-            elif re.search(r'_{2,}', full_block_text) and "answer:" in full_lower:
-                question_data = _parse_fill_in_the_blank(full_block_text, i)
-            elif "answer:" in full_lower and re.search(r'\n\s*[A-Z]\)', "\n"+"\n".join(lines), re.IGNORECASE):
-                question_data = _parse_multiple_choice(lines, i)
-            elif "answer:" in full_lower and re.search(r'\((T/F|True/False)\)', full_block_text, re.IGNORECASE):
-                question_data = _parse_true_false(lines, i)
-            else:
-                error_hint = "Format not recognized."
-                if re.search(r'\n[A-Z][\)\.]', "\n"+"\n".join(lines), re.IGNORECASE):
-                    error_hint = "Looks like Multiple Choice, but check if the 'Answer:' line is correct."
-                elif re.search(r'_{1,}', block):
-                    error_hint = "Looks like Fill-in-the-Blank, but check if 'Answer:' line is present."
-                elif "True" in block or "False" in block:
-                    error_hint = "Looks like True/False. Ensure it ends with 'Answer: True' or 'Answer: False'."
-
-                question_data = {
-                    "id": f"error_{i}",
-                    "type": "error",
-                    "question_text": block,
-                    "error": f"{error_hint} Please refer to the formatting guide.",
-                }
+    if detect_respondus_format(block):
+        points = extract_points(block)
+        # Detect subtype
+        type_match = re.search(r'^Type:\s*([A-Z]+)', block, re.IGNORECASE | re.MULTILINE)
+        r_type = type_match.group(1).upper() if type_match else "MC"
         
+        # Legacy T/F check (not strictly 'Type: TF' but just *True/*False)
+        if r_type == "MC" and re.search(r'^\s*\*(True|False|T|F)\s*$', block, re.IGNORECASE | re.MULTILINE):
+            r_type = "TF"
+        if r_type not in RESPONDUS_TYPES:
+            return "respondus_unsupported", r_type, points
+
+        # Pre-clean lines for Respondus: remove Type: and Points: and numbering
+        clean_lines = []
+        for line in lines:
+            l = line.strip()
+            if re.match(r'^(Type|Points):', l, re.IGNORECASE):
+                continue
+            if re.match(r'^\d+[\.\)]\s+', l):
+                l = re.sub(r'^\d+[\.\)]\s+', '', l)
+            clean_lines.append(l)
+        return f"respondus_{RESPONDUS_TYPES[r_type]}", clean_lines, points
+
+    # Fallback to Core Branch
+    # (Existing Router Logic)
+    if re.match(r'^\d+[\.\)]\s+', lines[0]):
+        lines[0] = re.sub(r'^\d+[\.\)]\s+', '', lines[0])
+    full_block_text = " ".join(lines)
+    full_lower = full_block_text.lower()
+    points = extract_points(full_block_text)
+
+    # Check for Multiple Blanks first (Core)
+    if _split_core_fmb(full_block_text)[3]:
+        return "fmb", full_block_text, points
+    if full_lower.startswith("tf:") or full_lower.startswith("true/false:"):
+        return "tf", lines, points
+    if full_lower.startswith("sa:") or "[short answer]" in full_lower:
+        return "sa", full_block_text, points
+    if full_lower.startswith("essay:") or "[essay]" in full_lower:
+        return "essay", full_block_text, points
+    if re.search(r'_{2,}', full_block_text) and "answer:" in full_lower:
+        return "fib", full_block_text, points
+    if "answer:" in full_lower and re.search(r'\n\s*[A-Z]\)', "\n"+"\n".join(lines), re.IGNORECASE):
+        return "mc", lines, points
+    if "answer:" in full_lower and re.search(r'\((T/F|True/False)\)', full_block_text, re.IGNORECASE):
+        return "tf", lines, points
+    return "unrecognized", _unrecognized_hint(block, lines), points
+
+def _parse_block(block, i):
+    """Parses one non-empty question block. `i` is its position in the document, used in ids."""
+    kind, arg, points = _route_block(block)
+
+    if kind.startswith("respondus_"):
+        print(f"Parsing block {i} as Respondus Format")
+        if kind == "respondus_MC":
+            return parse_respondus_mcq(arg, i, points)
+        if kind == "respondus_TF":
+            return parse_respondus_tf(arg, i, points)
+        if kind == "respondus_E":
+            return parse_respondus_essay(arg, i, points)
+        if kind == "respondus_F":
+            return parse_respondus_fib(arg, i, points)
+        if kind == "respondus_FMB":
+            return parse_respondus_fmb(arg, i, points)
+        if kind == "respondus_MR":
+            return parse_respondus_mr(arg, i, points)
+        return {"id": f"error_{i}", "type": "error", "question_text": block, "error": f"Unsupported Respondus type: {arg}"}
+
+    print(f"Parsing block {i} as Core Format")
+    if kind == "fmb":
+        return _parse_core_fmb(arg, i)
+    if kind == "tf":
+        return _parse_true_false(arg, i)
+    if kind == "sa":
+        return _parse_short_answer(arg, i)
+    if kind == "essay":
+        return _parse_essay(arg, i)
+    if kind == "fib":
+        return _parse_fill_in_the_blank(arg, i)
+    if kind == "mc":
+        return _parse_multiple_choice(arg, i)
+    return {
+        "id": f"error_{i}",
+        "type": "error",
+        "question_text": block,
+        "error": arg,
+    }
+
+def _split_blocks(text_input):
+    """
+    Yields (index, block, first_line, last_line) for every non-empty question block,
+    with 1-based line numbers in `text_input`. Blocks are separated by blank lines.
+    """
+    stripped = text_input.strip()
+    line = text_input[:len(text_input) - len(text_input.lstrip())].count('\n') + 1
+    parts = re.split(r'(\n\s*\n)', stripped)
+    for i, block in enumerate(parts[0::2]):
+        first_line = line
+        line += block.count('\n')
+        if block.strip():
+            yield i, block, first_line, line
+        if 2 * i + 1 < len(parts):
+            line += parts[2 * i + 1].count('\n')
+
+def count_question_blocks(text_input):
+    """Number of entries iter_parse_quiz_text will yield for `text_input`."""
+    return sum(1 for _ in _split_blocks(text_input))
+
+def iter_parse_quiz_text(text_input):
+    """
+    Yields the parsed question (or error entry) for each block of the quiz text, in
+    order. Checks the conversion's CPU-time deadline before every block.
+    """
+    for i, block, _, _ in _split_blocks(text_input):
+        check()
+        question_data = _parse_block(block, i)
         if question_data:
-            questions.append(question_data)
-            
-    return questions
+            yield question_data
+
+def parse_quiz_text(text_input):
+    """
+    Correctly parses multi-line quiz questions from a single text block.
+    """
+    return list(iter_parse_quiz_text(text_input))
+
+@functools.lru_cache(maxsize=4096)
+def _validate_block(block):
+    """
+    (type, points, error) for one block, as _parse_block would report it but without
+    building the answers. Cached by block text, so re-validating a document after an
+    edit only checks the blocks that changed.
+    """
+    kind, arg, points = _route_block(block)
+    q_type, error = _CHECKS[kind](arg)
+    return q_type, points, error
+
+def validate_quiz_text(text_input):
+    """
+    Compact check of a quiz text for editor feedback: question counts by type, the
+    total points of the valid questions, and each error with its block index and
+    1-based line range. Answer contents are not returned.
+    """
+    counts = {}
+    total_points = 0.0
+    errors = []
+    for i, block, first_line, last_line in _split_blocks(text_input):
+        check()
+        q_type, points, error = _validate_block(block)
+        counts[q_type] = counts.get(q_type, 0) + 1
+        if q_type == "error":
+            errors.append({"block": i, "line_start": first_line, "line_end": last_line, "error": error})
+            continue
+        try:
+            total_points += float(points)
+        except (TypeError, ValueError):
+            pass
+    return {
+        "questions": sum(counts.values()),
+        "counts": counts,
+        "total_points": total_points,
+        "errors": errors,
+    }
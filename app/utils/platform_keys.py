@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+import requests
+from jwcrypto.jwk import JWK
+from pylti1p3.exception import LtiException
+from . import canvas_client, metrics
+from .singleflight import SingleFlight
+
+# Platform public keys used to verify LTI id_tokens. Each platform key set is
+# fetched once per process, converted to PEM once, and indexed by kid so a
+# launch only needs a dict lookup. Sets are refreshed in the background before
+# they expire, and a kid we have never seen (the platform rotated its keys)
+# triggers one coalesced refetch rather than one per concurrent launch.
+
+_sets = {}  # (issuer, key_set_url) -> {"keys": {kid: (alg, pem)}, "fetched_at": monotonic}
+_sets_lock = threading.Lock()
+_refreshing = set()
+_flight = SingleFlight()
+
+metrics.describe('lti_platform_jwks_fetches_total', 'counter',
+                 'Platform JWKS fetches by reason (miss, expired, unknown_kid, background) and outcome.')
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+def _fetch(issuer, key_set_url, reason):
+    try:
+        res = canvas_client.get(key_set_url)
+        res.raise_for_status()
+        document = res.json()
+    except (requests.exceptions.RequestException, ValueError):
+        metrics.inc('lti_platform_jwks_fetches_total', reason=reason, outcome='error')
+        raise
+    metrics.inc('lti_platform_jwks_fetches_total', reason=reason, outcome='ok')
+
+    keys = {}
+    for key in document.get('keys', []):
+        kid = key.get('kid')
+        if not kid:
+            continue
+        try:
+            pem = JWK.from_json(json.dumps(key)).export_to_pem()
+        except (ValueError, TypeError):
+            continue
+        keys[kid] = (key.get('alg', 'RS256'), pem)
+
+    entry = {'keys': keys, 'fetched_at': time.monotonic()}
+    with _sets_lock:
+        _sets[(issuer, key_set_url)] = entry
+    return entry
+
+def _refresh(issuer, key_set_url, reason):
+    return _flight.do((issuer, key_set_url), lambda: _fetch(issuer, key_set_url, reason))
+
+def _refresh_in_background(issuer, key_set_url):
+    set_key = (issuer, key_set_url)
+    with _sets_lock:
+        if set_key in _refreshing:
+            return
+        _refreshing.add(set_key)
+
+    def run():
+        try:
+            _refresh(issuer, key_set_url, 'background')
+        except (requests.exceptions.RequestException, ValueError):
+            pass  # Keep serving the cached set; the next launch past the threshold tries again
+        finally:
+            with _sets_lock:
+                _refreshing.discard(set_key)
+
+    threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+def get_public_key(issuer, key_set_url, kid, alg):
+    """
+    Returns (pem, alg) for the platform key `kid`. Key sets are cached for
+    PLATFORM_JWKS_TTL seconds and refreshed in the background once they are older
+    than PLATFORM_JWKS_REFRESH_AFTER. An unknown kid refetches the set, at most once
+    per PLATFORM_JWKS_MIN_REFETCH seconds, so random kids cannot be used to hammer
+    the platform. If a refresh fails, the expired set is still used.
+    Raises LtiException when no matching key can be found.
+    """
+    set_key = (issuer, key_set_url)
+    now = time.monotonic()
+    with _sets_lock:
+        entry = _sets.get(set_key)
+
+    try:
+        if entry is None:
+            entry = _refresh(issuer, key_set_url, 'miss')
+        elif now - entry['fetched_at'] >= _env_float('PLATFORM_JWKS_TTL', 3600):
+            try:
+                entry = _refresh(issuer, key_set_url, 'expired')
+            except (requests.exceptions.RequestException, ValueError):
+                pass
+        elif now - entry['fetched_at'] >= _env_float('PLATFORM_JWKS_REFRESH_AFTER', 2700):
+            _refresh_in_background(issuer, key_set_url)
+
+        found = entry['keys'].get(kid)
+        if found is None and now - entry['fetched_at'] >= _env_float('PLATFORM_JWKS_MIN_REFETCH', 30):
+            entry = _refresh(issuer, key_set_url, 'unknown_kid')
+            found = entry['keys'].get(kid)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise LtiException(f"Error during fetch URL {key_set_url}: {str(e)}") from e
+
+    if found is None or found[0] != alg:
+        raise LtiException("Unable to find public key")
+    return found[1], found[0]
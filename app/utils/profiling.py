@@ -0,0 +1,192 @@
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from flask import g, request
+from . import metrics
+
+# Opt-in cProfile capture for the conversion endpoints, to diagnose documents
+# that are slow for one instructor without needing their file. A request is
+# profiled when it is sampled (PROFILE_SAMPLE_RATE) or carries a valid signed
+# X-Profile-Token. With neither configured, init_app registers no hooks at all.
+
+PROFILED_ENDPOINTS = {'api.preview', 'api.download', 'api.canvas'}
+# /api/canvas only submits a job; its parsing and export run in the job, so that is what gets profiled
+JOB_ENDPOINTS = {'api.canvas'}
+HEADER = 'X-Profile-Token'
+
+metrics.describe('qti_profiles_captured_total', 'counter',
+                 'Request profiles written to PROFILE_DIR, by endpoint and trigger (sampled or header).')
+
+_settings = None
+# cProfile hooks are process-wide from Python 3.12, so only one profile runs at a time
+_active = threading.Lock()
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+def sign(secret, method, path, timestamp=None):
+    """Value for the X-Profile-Token header that requests a profile of `method path`."""
+    timestamp = str(int(timestamp if timestamp is not None else time.time()))
+    digest = hmac.new(secret.encode('utf-8'), f"{timestamp}\n{method.upper()}\n{path}".encode('utf-8'),
+                      hashlib.sha256).hexdigest()
+    return f"{timestamp}.{digest}"
+
+def _valid_token(token):
+    secret = _settings['secret']
+    if not secret or not token or '.' not in token:
+        return False
+    timestamp = token.split('.', 1)[0]
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > _settings['token_max_age']:
+        return False
+    return hmac.compare_digest(token, sign(secret, request.method, request.path, timestamp))
+
+def _trigger():
+    """'header' or 'sampled' if the current request should be profiled, otherwise None."""
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return None
+    if HEADER in request.headers and _valid_token(request.headers[HEADER]):
+        return 'header'
+    if random.random() < _settings['rate']:
+        return 'sampled'
+    return None
+
+def _input_metadata():
+    """Sizes of the request's quiz input. The content itself is never recorded."""
+    meta = {'content_length': request.content_length, 'content_type': request.mimetype}
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    if upload:
+        upload.stream.seek(0, os.SEEK_END)
+        meta['upload_bytes'] = upload.stream.tell()
+        upload.stream.seek(0)
+        meta['upload_extension'] = os.path.splitext(upload.filename or '')[1].lower()
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            quiz_text = data.get('quiz_text') or ''
+            meta['quiz_text_chars'] = len(quiz_text)
+            meta['quiz_text_lines'] = quiz_text.count('\n') + 1 if quiz_text else 0
+    return meta
+
+def _rotate(directory, keep):
+    profiles = sorted((entry for entry in os.scandir(directory) if entry.name.endswith('.prof')),
+                      key=lambda entry: entry.stat().st_mtime)
+    for entry in profiles[:max(0, len(profiles) - keep)]:
+        for path in (entry.path, entry.path[:-len('.prof')] + '.json'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _write(profile, meta):
+    directory = _settings['dir']
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{meta['endpoint']}-{uuid.uuid4().hex[:8]}")
+    profile.dump_stats(base + '.prof')
+    with open(base + '.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    _rotate(directory, _settings['max_files'])
+    metrics.inc('qti_profiles_captured_total', endpoint=meta['endpoint'], trigger=meta['trigger'])
+
+def _capture(fn, meta):
+    """Runs fn() under cProfile and writes the profile. Runs it unprofiled if another profile is active."""
+    if not _active.acquire(blocking=False):
+        return fn()
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profile.enable()
+        try:
+            return fn()
+        finally:
+            profile.disable()
+            meta['duration_seconds'] = round(time.perf_counter() - start, 6)
+            _write(profile, meta)
+    finally:
+        _active.release()
+
+def _start_request():
+    trigger = _trigger()
+    if trigger is None:
+        return
+    meta = {'endpoint': request.endpoint, 'method': request.method, 'trigger': trigger,
+            'started_at': time.time(), **_input_metadata()}
+    if request.endpoint in JOB_ENDPOINTS:
+        g._profile_job = meta
+    elif _active.acquire(blocking=False):
+        profile = cProfile.Profile()
+        g._profile = (profile, meta, time.perf_counter())
+        profile.enable()
+
+def _save(profile, meta, start):
+    profile.disable()
+    try:
+        meta['duration_seconds'] = round(time.perf_counter() - start, 6)
+        _write(profile, meta)
+    finally:
+        _active.release()
+
+def _finish_request(response):
+    captured = g.pop('_profile', None)
+    if captured is None:
+        return response
+    profile, meta, start = captured
+    meta['status'] = response.status_code
+    # Registered after timing, so this runs before it consumes the phases
+    meta['phases'] = {name: round(elapsed, 6) for name, elapsed in g.get('_phases', {}).items()}
+    if response.is_streamed:
+        # The body (e.g. the NDJSON preview, where the parsing happens) runs after this
+        # hook, so keep profiling until the server has sent it or the client went away
+        meta['streamed'] = True
+        response.call_on_close(lambda: _save(profile, meta, start))
+    else:
+        _save(profile, meta, start)
+    return response
+
+def _abandon_request(exc):
+    # An unhandled exception skips after_request; stop profiling without writing
+    captured = g.pop('_profile', None)
+    if captured is not None:
+        captured[0].disable()
+        _active.release()
+
+def job(fn):
+    """
+    Wraps a job body so it is profiled when the submitting request was selected.
+    Returns `fn` unchanged otherwise (always, when profiling is disabled).
+    """
+    meta = g.pop('_profile_job', None) if _settings else None
+    if meta is None:
+        return fn
+
+    def profiled(job_handle, *args, **kwargs):
+        return _capture(lambda: fn(job_handle, *args, **kwargs), {**meta, 'phase': 'job'})
+    return profiled
+
+def init_app(app):
+    """Registers the profiling hooks if PROFILE_SAMPLE_RATE or PROFILE_ADMIN_SECRET is set."""
+    global _settings
+    rate = _env_float('PROFILE_SAMPLE_RATE', 0)
+    secret = os.getenv('PROFILE_ADMIN_SECRET', '')
+    if rate <= 0 and not secret:
+        _settings = None
+        return
+    _settings = {
+        'rate': rate,
+        'secret': secret,
+        'token_max_age': _env_float('PROFILE_TOKEN_MAX_AGE', 300),
+        'dir': os.getenv('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'qti-profiles'),
+        'max_files': int(_env_float('PROFILE_MAX_FILES', 50)),
+    }
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_abandon_request)
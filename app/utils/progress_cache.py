@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from . import canvas_tokens
+from .singleflight import SingleFlight
+
+TERMINAL_STATES = ('completed', 'failed')
+MAX_ENTRIES = 1024
+
+_entries = {}  # (token scope, progress_url) -> (expires_at, payload)
+_entries_lock = threading.Lock()
+_flight = SingleFlight()
+
+def _ttl_for(payload):
+    """Running migrations change quickly; finished ones never change again."""
+    if payload.get('workflow_state') in TERMINAL_STATES:
+        return float(os.getenv('PROGRESS_TERMINAL_CACHE_TTL', '300'))
+    return float(os.getenv('PROGRESS_CACHE_TTL', '1.0'))
+
+def _prune(now):
+    expired = [key for key, (expires_at, _) in _entries.items() if expires_at <= now]
+    for key in expired:
+        del _entries[key]
+    # Still over budget: drop the entries closest to expiring
+    if len(_entries) > MAX_ENTRIES:
+        for key, _ in sorted(_entries.items(), key=lambda item: item[1][0])[:len(_entries) - MAX_ENTRIES]:
+            del _entries[key]
+
+def _fetch(key, progress_url, token_source):
+    res = canvas_tokens.authorized_request('GET', progress_url, token_source)
+    res.raise_for_status()
+    payload = res.json()
+
+    now = time.monotonic()
+    with _entries_lock:
+        _entries[key] = (now + _ttl_for(payload), payload)
+        if len(_entries) > MAX_ENTRIES:
+            _prune(now)
+    return payload
+
+def get_progress(progress_url, token_source):
+    """
+    Returns the Canvas progress payload for `progress_url`, fetched with the token from
+    `token_source` (a canvas_tokens.TokenSource). Responses are cached per user and
+    URL for PROGRESS_CACHE_TTL seconds (PROGRESS_TERMINAL_CACHE_TTL once completed or
+    failed), and concurrent misses share a single upstream request, so Canvas sees at
+    most one call per user and URL per TTL window from this process however many tabs
+    poll. Entries are never shared between users, so Canvas checks every user's own
+    token before they see a migration's progress.
+    Raises requests.exceptions.RequestException on upstream failure; errors are not cached.
+    """
+    key = (token_source.scope(), progress_url)
+    with _entries_lock:
+        entry = _entries.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return _flight.do(key, lambda: _fetch(key, progress_url, token_source))
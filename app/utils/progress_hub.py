@@ -0,0 +1,132 @@
+import os
+import queue
+import threading
+import time
+import requests
+from .progress_cache import get_progress, TERMINAL_STATES
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+class _Watcher:
+    """
+    Polls one Canvas progress URL on a background thread and fans each change out
+    to every subscriber queue. The interval starts at PROGRESS_POLL_MIN, grows by
+    PROGRESS_POLL_BACKOFF while nothing changes (up to PROGRESS_POLL_MAX) and
+    snaps back to the minimum as soon as Canvas reports new progress.
+    """
+    def __init__(self, hub, app, key, url, token_source):
+        self.hub = hub
+        self.app = app
+        self.key = key
+        self.url = url
+        self.token_source = token_source
+        self.subscribers = set()
+        self.last_event = None
+        self.thread = threading.Thread(target=self._run, name='progress-watch', daemon=True)
+
+    def _broadcast(self, event):
+        # Under the hub lock, so a joining subscriber gets the event as last_event or from the fan-out, not both
+        with self.hub.lock:
+            self.last_event = event
+            for q in self.subscribers:
+                q.put(event)
+
+    def _poll(self):
+        # Shares the proxy's short-TTL cache, so streams and polling clients coalesce too
+        return get_progress(self.url, self.token_source)
+
+    def _run(self):
+        min_interval = _env_float('PROGRESS_POLL_MIN', 0.5)
+        max_interval = _env_float('PROGRESS_POLL_MAX', 5)
+        backoff = _env_float('PROGRESS_POLL_BACKOFF', 1.5)
+        deadline = time.monotonic() + _env_float('PROGRESS_WATCH_TIMEOUT', 600)
+        interval = min_interval
+        last_progress = None
+        errors = 0
+
+        with self.app.app_context():
+            while True:
+                try:
+                    progress = self._poll()
+                    errors = 0
+                except requests.exceptions.RequestException as e:
+                    errors += 1
+                    if errors >= 3:
+                        self._broadcast({"event": "error", "error": str(e)})
+                        break
+                else:
+                    if progress != last_progress:
+                        last_progress = progress
+                        interval = min_interval
+                        self._broadcast({"event": "progress", "data": progress})
+                    else:
+                        interval = min(max_interval, interval * backoff)
+                    if progress.get('workflow_state') in TERMINAL_STATES:
+                        break
+
+                if time.monotonic() >= deadline:
+                    self._broadcast({"event": "error", "error": "Timed out waiting for Canvas to finish processing."})
+                    break
+                if self.hub._retire_if_idle(self):
+                    return
+                time.sleep(interval)
+
+        self.hub._retire(self)
+
+class ProgressHub:
+    """
+    Shares one upstream poller per progress URL between every client of the same
+    Canvas user watching it (e.g. several tabs). Pollers are never shared across
+    users, since each polls with its first subscriber's token.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.watchers = {}
+
+    def subscribe(self, app, url, token_source):
+        """Returns a queue that receives progress events for `url`, starting a poller if none is running."""
+        key = (token_source.scope(), url)
+        q = queue.Queue()
+        with self.lock:
+            watcher = self.watchers.get(key)
+            if watcher is None:
+                watcher = _Watcher(self, app, key, url, token_source)
+                self.watchers[key] = watcher
+                watcher.thread.start()
+            watcher.subscribers.add(q)
+            # Late joiners immediately see the most recent state
+            if watcher.last_event is not None:
+                q.put(watcher.last_event)
+        return q
+
+    def unsubscribe(self, url, token_source, q):
+        with self.lock:
+            watcher = self.watchers.get((token_source.scope(), url))
+            if watcher is not None:
+                watcher.subscribers.discard(q)
+
+    def _retire_if_idle(self, watcher):
+        """
+        Stops tracking `watcher` if nobody is subscribed. The check and the removal share
+        one lock, so a new subscriber either keeps it alive or starts a fresh watcher.
+        """
+        with self.lock:
+            if watcher.subscribers:
+                return False
+            if self.watchers.get(watcher.key) is watcher:
+                del self.watchers[watcher.key]
+            return True
+
+    def _retire(self, watcher):
+        with self.lock:
+            if self.watchers.get(watcher.key) is watcher:
+                del self.watchers[watcher.key]
+            # Tell any remaining streams that no further events are coming
+            for q in watcher.subscribers:
+                q.put(None)
+
+hub = ProgressHub()
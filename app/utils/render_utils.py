@@ -1,19 +1,46 @@
-from flask import render_template
+import json
+import threading
+from flask import Response, current_app, render_template
 from .vite_manifest import get_vite_assets
 
+_shells = {}  # (template, vite assets) -> (bytes up to and including <head>, rest of the page)
+_shells_lock = threading.Lock()
+
+def _get_shell(template):
+    """
+    The SPA shell rendered once per build and split where per-launch globals go.
+    The template must not depend on per-request values; those are spliced in by
+    _render_with_globals. Debug mode always re-renders so template edits show up.
+    """
+    assets = get_vite_assets()
+    key = (template, assets)
+    shell = _shells.get(key)
+    if shell is not None and not current_app.debug:
+        return shell
+
+    vite_js_asset, vite_css_asset = assets
+    html = render_template(template, vite_js_asset=vite_js_asset, vite_css_asset=vite_css_asset).encode('utf-8')
+    head, marker, rest = html.partition(b'<head>')
+    shell = (head + marker, rest) if marker else (b'', html)
+    with _shells_lock:
+        # A new build makes the old shells unreachable
+        if any(k[1] != assets for k in _shells):
+            _shells.clear()
+        _shells[key] = shell
+    return shell
+
+def _course_script(course_id):
+    # JSON-encode and escape '<' so a crafted course id cannot close the script tag
+    value = json.dumps(str(course_id)).replace('<', '\\u003c')
+    return f'<script>window.CANVAS_COURSE_ID = {value};</script>'.encode('utf-8')
+
 def _render_with_globals(template, course_id, api_token):
-    """Renders a template and injects CANVAS_COURSE_ID as a window global.
+    """Serves the prerendered template and injects CANVAS_COURSE_ID as a window global.
     The API token is intentionally kept server-side only and never sent to the client.
     """
-    vite_js_asset, vite_css_asset = get_vite_assets()
-    html = render_template(
-        template,
-        course_id=course_id,
-        has_token=bool(api_token),
-        vite_js_asset=vite_js_asset,
-        vite_css_asset=vite_css_asset,
-    )
+    head, rest = _get_shell(template)
     if course_id:
-        script = f'<script>window.CANVAS_COURSE_ID = "{course_id}";</script>'
-        html = html.replace('<head>', f'<head>{script}')
-    return html
+        body = b''.join((head, _course_script(course_id), rest))
+    else:
+        body = head + rest
+    return Response(body, mimetype='text/html')
@@ -236,3 +236,57 @@ def parse_respondus_mr(lines, i, points):
         "correct_answer_ids": correct_ids, # Note: plural
         "points": points
     }
+
+# --- Validation checks ---
+# (type, error) of the matching parser above, without building the answers.
+
+def _starred_options(lines):
+    """(number of options, number marked correct with *) in Respondus MC/MR lines."""
+    options = correct = 0
+    for line in lines:
+        opt_match = re.match(r'^(\*?)([A-Z])[\.\)]\s*(.*)', line.strip(), re.IGNORECASE)
+        if opt_match:
+            options += 1
+            correct += bool(opt_match.group(1))
+    return options, correct
+
+def check_respondus_mcq(lines):
+    options, correct = _starred_options(lines)
+    if not options or not correct:
+        return "error", "Invalid Respondus MCQ format. Ensure at least one correct answer is marked with *."
+    return ("multiple_answers_question" if correct > 1 else "multiple_choice_question"), None
+
+def check_respondus_tf(lines):
+    if not any(line.strip().lower() in ["*true", "*t", "*false", "*f"] for line in lines):
+        return "error", "Could not find correct answer for Respondus T/F. Mark with '*'."
+    return "true_false_question", None
+
+def check_respondus_fib(lines):
+    if not any(re.match(r'^[a-z0-9][\.\)]\s*(.*)', line.strip(), re.IGNORECASE) for line in lines):
+        return "error", "No answers found for Short Answer question. List them as 'a. Answer'."
+    return "short_answer_question", None
+
+def check_respondus_fmb(lines):
+    question_lines = []
+    defined = set()
+    for line in lines:
+        l = line.strip()
+        match = re.match(r'^([^=]+)\s*=\s*(.*)', l)
+        if match:
+            defined.add(match.group(1).strip().lower())
+        else:
+            question_lines.append(l)
+
+    variables = re.findall(r'\[([^\]]+)\]', _clean_points_text(" ".join(question_lines).strip()))
+    if not variables:
+        return "error", "No bracketed variables found in FMB question (e.g. [color])."
+    missing_vars = [var for var in variables if var.lower() not in defined]
+    if missing_vars:
+        return "error", f"Missing definitions for bracketed variables: {', '.join(missing_vars)}. Each variable like [blank] must have a matching 'blank = answer' line."
+    return "fill_in_multiple_blanks_question", None
+
+def check_respondus_mr(lines):
+    options, correct = _starred_options(lines)
+    if not options or not correct:
+        return "error", "Invalid Respondus MR format. Ensure correct answers are marked with *."
+    return "multiple_answers_question", None
@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+from .singleflight import SingleFlight
+from .vite_manifest import get_hashed_files
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are offered
+    brotli = None
+
+# Vite names bundles like assets/index-lRHu9J41.js; a new build produces a new name,
+# so these can be cached forever. Everything else (including files copied from
+# public/, whatever their names) is revalidated.
+HASHED_ASSET = re.compile(r'^assets/[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_EXTENSIONS = ('.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml')
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_flight = SingleFlight()
+
+def html_max_age():
+    """Cache lifetime for the HTML shell, which points at the current hashed bundles."""
+    return int(os.getenv('ASSET_HTML_MAX_AGE', '60'))
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def compress_file(path, encoding, target):
+    """Writes the `encoding` ('br' or 'gzip') variant of `path` to `target`, atomically."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(_compress(data, encoding))
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def available_encodings():
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+
+def is_compressible(path):
+    if not path.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+        return False
+    return os.path.getsize(path) >= int(os.getenv('ASSET_COMPRESS_MIN_SIZE', '1024'))
+
+def _fresh(path, source_mtime):
+    try:
+        return os.stat(path).st_mtime_ns >= source_mtime
+    except OSError:
+        return False
+
+def _variant_path(path, encoding, suffix):
+    """
+    A precompressed sibling written at build time (scripts/precompress_assets.py) if it
+    is up to date, otherwise a copy compressed on first request into ASSET_COMPRESS_DIR
+    (the app directory may be read-only). Concurrent first requests compress once.
+    """
+    source_mtime = os.stat(path).st_mtime_ns
+    if _fresh(path + suffix, source_mtime):
+        return path + suffix
+
+    cache_dir = os.getenv('ASSET_COMPRESS_DIR') or os.path.join(tempfile.gettempdir(), 'qti-assets')
+    name = f"{hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]}-{os.path.basename(path)}{suffix}"
+    target = os.path.join(cache_dir, name)
+    if _fresh(target, source_mtime):
+        return target
+
+    def build():
+        os.makedirs(cache_dir, exist_ok=True)
+        compress_file(path, encoding, target)
+        return target
+    return _flight.do(target, build)
+
+def _negotiate(path):
+    """(encoding, file to send) for the current request's Accept-Encoding."""
+    for encoding, suffix in available_encodings():
+        if request.accept_encodings.quality(encoding) > 0:
+            try:
+                return encoding, _variant_path(path, encoding, suffix)
+            except OSError:
+                break  # Could not write a variant; fall back to the original
+    return None, path
+
+def is_hashed_asset(filename):
+    """True for files the current build emitted under a content hash, per its Vite manifest."""
+    hashed_files = get_hashed_files()
+    if hashed_files is None:
+        # No manifest (e.g. a hand-copied build): trust hash-shaped names in Vite's assets/ only
+        return bool(HASHED_ASSET.match(filename))
+    return filename in hashed_files
+
+def send_asset(filename):
+    """
+    Serves a file from the static folder. Content-hashed bundles get a year-long
+    immutable Cache-Control, HTML a short one, and text assets are sent gzip or
+    brotli encoded when the client accepts it.
+    """
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    immutable = is_hashed_asset(filename)
+    if immutable:
+        max_age = IMMUTABLE_MAX_AGE
+    elif filename.endswith('.html'):
+        max_age = html_max_age()
+    else:
+        max_age = None  # Flask's default: revalidate with the ETag
+
+    compressible = is_compressible(path)
+    encoding, send_path = _negotiate(path) if compressible else (None, path)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    response = send_file(send_path, mimetype=mimetype, max_age=max_age, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,55 @@
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from . import metrics
+
+# Phase timing for the conversion pipeline. Every phase feeds a latency
+# histogram; inside a request it is also reported back in the Server-Timing
+# header so slow requests can be broken down from the browser's dev tools.
+
+metrics.describe('http_request_duration_seconds', 'histogram',
+                 'Time to produce a response, by endpoint, method and status.')
+metrics.describe('qti_phase_duration_seconds', 'histogram',
+                 'Time spent in each conversion phase (read_file, parse, build_xml, pretty_print, zip, ...).')
+
+def _record(name, elapsed):
+    metrics.observe('qti_phase_duration_seconds', elapsed, phase=name)
+    if has_request_context():
+        phases = g.setdefault('_phases', {})
+        phases[name] = phases.get(name, 0.0) + elapsed
+
+@contextmanager
+def phase(name):
+    """Times the enclosed block as phase `name`. Repeated phases in one request add up."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+def add(name, elapsed):
+    """Adds time measured elsewhere to the current request's Server-Timing entry only."""
+    if has_request_context():
+        phases = g.setdefault('_phases', {})
+        phases[name] = phases.get(name, 0.0) + elapsed
+
+def _start_request():
+    g._request_start = time.perf_counter()
+
+def _finish_request(response):
+    start = g.pop('_request_start', None)
+    if start is None:
+        return response
+    total = time.perf_counter() - start
+    metrics.observe('http_request_duration_seconds', total, endpoint=request.endpoint or 'unmatched',
+                    method=request.method, status=response.status_code)
+
+    entries = [f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in g.pop('_phases', {}).items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    response.headers.add('Server-Timing', ', '.join(entries))
+    return response
+
+def init_app(app):
+    """Times every request and adds a Server-Timing header listing its phases."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from werkzeug.datastructures import FileStorage
+from . import metrics
+
+# Resumable chunked uploads for large source documents. A client creates an
+# upload, PUTs its parts (in any order, retrying any that fail) and completes
+# it; the server assembles the parts, checks size and SHA-256, and the upload id
+# becomes a handle /api/preview and /api/download accept in place of a file.
+# Parts live on local disk under UPLOAD_DIR, so workers behind one host share
+# them; uploads idle for UPLOAD_TTL seconds are deleted. Each session may hold
+# at most UPLOAD_MAX_PER_OWNER uploads totalling UPLOAD_MAX_OWNER_BYTES.
+
+UPLOAD_ID = re.compile(r'^[A-Za-z0-9_-]{22}$')
+COPY_BUFFER = 64 * 1024
+
+metrics.describe('qti_uploads_total', 'counter', 'Chunked uploads by outcome (created, completed, expired, aborted).')
+metrics.describe('qti_upload_part_bytes_total', 'counter', 'Bytes received in chunked upload parts.')
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return float(default)
+
+def upload_dir():
+    return os.getenv('UPLOAD_DIR') or os.path.join(tempfile.gettempdir(), 'qti-uploads')
+
+def chunk_size():
+    return int(_env_float('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+
+def _path(upload_id, *parts):
+    return os.path.join(upload_dir(), upload_id, *parts)
+
+def _write_meta(meta):
+    fd, tmp_path = tempfile.mkstemp(dir=_path(meta['upload_id']), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _path(meta['upload_id'], 'meta.json'))
+
+def _read_meta(upload_id):
+    try:
+        with open(_path(upload_id, 'meta.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return None
+
+def _parts_total(meta):
+    return max(1, -(-meta['size'] // meta['chunk_size']))
+
+def _received_parts(meta):
+    names = os.listdir(_path(meta['upload_id']))
+    return sorted(int(name[5:]) for name in names if name.startswith('part-') and name[5:].isdigit())
+
+def _touch(meta):
+    """Uploads are expired by inactivity, measured on their directory."""
+    os.utime(_path(meta['upload_id']))
+
+# --- Garbage collection ---
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+def collect_garbage(now=None):
+    """Deletes uploads (finished or not) untouched for UPLOAD_TTL seconds. Returns how many were removed."""
+    now = now or time.time()
+    ttl = _env_float('UPLOAD_TTL', 3600)
+    removed = 0
+    try:
+        entries = list(os.scandir(upload_dir()))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir() and now - entry.stat().st_mtime > ttl:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    if removed:
+        metrics.inc('qti_uploads_total', removed, outcome='expired')
+    return removed
+
+def _maybe_collect_garbage():
+    """Sweeps at most once per UPLOAD_GC_INTERVAL seconds per process, piggybacking on any upload call."""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < _env_float('UPLOAD_GC_INTERVAL', 300) or not _sweep_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sweep = now
+        collect_garbage(now)
+    finally:
+        _sweep_lock.release()
+
+# --- Upload lifecycle ---
+
+def _owner_usage(owner):
+    """(count, bytes) of the uploads, finished or not, that `owner` currently holds."""
+    count = total = 0
+    try:
+        names = os.listdir(upload_dir())
+    except FileNotFoundError:
+        return 0, 0
+    for name in names:
+        meta = _read_meta(name) if UPLOAD_ID.match(name) else None
+        if meta and meta.get('owner') == owner:
+            count += 1
+            total += meta['size']
+    return count, total
+
+def create(owner, filename, content_type, size, sha256=None):
+    """Starts an upload of `size` bytes for `owner`. Returns its metadata. Raises UploadError."""
+    max_bytes = int(_env_float('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise UploadError("size must be a positive integer")
+    if size > max_bytes:
+        raise UploadError(f"File is too large (limit {max_bytes} bytes)", 413)
+    if sha256 is not None and not re.fullmatch(r'[0-9a-fA-F]{64}', str(sha256)):
+        raise UploadError("sha256 must be a hex digest")
+
+    _maybe_collect_garbage()
+    # Best effort across workers: concurrent creates by one session may overshoot by a few
+    count, total = _owner_usage(owner)
+    if count >= int(_env_float('UPLOAD_MAX_PER_OWNER', 5)):
+        raise UploadError("Too many uploads in progress; complete or delete one first", 429)
+    max_owner_bytes = int(_env_float('UPLOAD_MAX_OWNER_BYTES', 2 * max_bytes))
+    if total + size > max_owner_bytes:
+        raise UploadError(f"Uploads for this session would exceed {max_owner_bytes} bytes; delete one first", 413)
+
+    meta = {
+        'upload_id': secrets.token_urlsafe(16),
+        'owner': owner,
+        'filename': os.path.basename(str(filename or 'upload')),
+        'content_type': str(content_type or 'application/octet-stream'),
+        'size': size,
+        'sha256': sha256.lower() if sha256 else None,
+        'chunk_size': chunk_size(),
+        'created_at': time.time(),
+        'complete': False,
+    }
+    os.makedirs(_path(meta['upload_id']))
+    _write_meta(meta)
+    metrics.inc('qti_uploads_total', outcome='created')
+    return meta
+
+def get(upload_id, owner):
+    """The upload's metadata if it exists and belongs to `owner`, otherwise None."""
+    if not upload_id or not UPLOAD_ID.match(upload_id):
+        return None
+    _maybe_collect_garbage()
+    meta = _read_meta(upload_id)
+    return meta if meta and meta.get('owner') == owner else None
+
+def status(meta):
+    """What the client needs to resume: the parts already stored and how many there are in total."""
+    received = [] if meta['complete'] else _received_parts(meta)
+    view = {
+        'upload_id': meta['upload_id'],
+        'size': meta['size'],
+        'chunk_size': meta['chunk_size'],
+        'parts_total': _parts_total(meta),
+        'parts_received': received,
+        'complete': meta['complete'],
+    }
+    if meta['complete']:
+        view['sha256'] = meta['digest']
+    return view
+
+def write_part(meta, index, stream, length):
+    """
+    Stores part `index` (0-based) read from `stream`. Parts are chunk_size bytes
+    except the last; sending a part again replaces it. Raises UploadError.
+    """
+    if meta['complete']:
+        raise UploadError("Upload is already complete", 409)
+    parts_total = _parts_total(meta)
+    if not 0 <= index < parts_total:
+        raise UploadError(f"Part index must be between 0 and {parts_total - 1}")
+    expected = min(meta['chunk_size'], meta['size'] - index * meta['chunk_size'])
+    if length != expected:
+        raise UploadError(f"Part {index} must be {expected} bytes, got {length}")
+
+    target = _path(meta['upload_id'], f'part-{index:06d}')
+    fd, tmp_path = tempfile.mkstemp(dir=_path(meta['upload_id']), suffix='.tmp')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            # Copied in small buffers so a worker never holds a whole part in memory
+            while written < expected:
+                buffer = stream.read(min(COPY_BUFFER, expected - written))
+                if not buffer:
+                    break
+                out.write(buffer)
+                written += len(buffer)
+        if written != expected:
+            raise UploadError(f"Part {index} was cut off after {written} of {expected} bytes")
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    metrics.inc('qti_upload_part_bytes_total', written)
+    _touch(meta)
+
+def complete(meta):
+    """
+    Concatenates the parts into the final file, verifying its size and (if given
+    at creation) SHA-256, and removes the parts. Returns the updated metadata.
+    Raises UploadError if parts are missing or the digest does not match.
+    Concurrent calls (e.g. a client retrying after a timeout) each assemble into
+    their own temporary file; whichever finishes second finds the upload complete.
+    """
+    if meta['complete']:
+        return meta
+    received = set(_received_parts(meta))
+    missing = [index for index in range(_parts_total(meta)) if index not in received]
+    if missing:
+        raise UploadError(f"Missing parts: {', '.join(str(index) for index in missing[:20])}", 409)
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=_path(meta['upload_id']), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for index in range(_parts_total(meta)):
+                with open(_path(meta['upload_id'], f'part-{index:06d}'), 'rb') as part:
+                    while True:
+                        buffer = part.read(COPY_BUFFER)
+                        if not buffer:
+                            break
+                        digest.update(buffer)
+                        out.write(buffer)
+            size = out.tell()
+        if size != meta['size'] or (meta['sha256'] and digest.hexdigest() != meta['sha256']):
+            raise UploadError("Assembled file does not match the declared size or sha256; upload the parts again", 422)
+        os.replace(tmp_path, _path(meta['upload_id'], 'data'))
+    except FileNotFoundError:
+        # A concurrent complete() consumed the parts first
+        current = _read_meta(meta['upload_id'])
+        if current and current['complete']:
+            return current
+        raise UploadError("Upload is being completed by another request; check its status", 409)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    for index in range(_parts_total(meta)):
+        try:
+            os.unlink(_path(meta['upload_id'], f'part-{index:06d}'))
+        except FileNotFoundError:
+            pass
+
+    meta = {**meta, 'complete': True, 'digest': digest.hexdigest()}
+    _write_meta(meta)
+    _touch(meta)
+    metrics.inc('qti_uploads_total', outcome='completed')
+    return meta
+
+def delete(meta):
+    shutil.rmtree(_path(meta['upload_id']), ignore_errors=True)
+    metrics.inc('qti_uploads_total', outcome='aborted')
+
+def open_file(upload_id, owner):
+    """
+    The completed upload as a FileStorage over an open file handle, as if it had
+    been posted as the `file` form field, or None if there is no such completed
+    upload for `owner`. The caller closes it.
+    """
+    meta = get(upload_id, owner)
+    if not meta or not meta['complete']:
+        return None
+    try:
+        stream = open(_path(upload_id, 'data'), 'rb')
+    except FileNotFoundError:
+        return None  # Collected since get()
+    _touch(meta)
+    return FileStorage(stream, filename=meta['filename'], content_type=meta['content_type'],
+                       content_length=meta['size'])
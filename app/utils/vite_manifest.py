@@ -1,7 +1,11 @@
 import json
 import os
+import threading
 from flask import current_app
 
+_cache = {}  # manifest path -> (mtime_ns, ((js_path, css_path), emitted files))
+_cache_lock = threading.Lock()
+
 
 def _load_manifest():
     """Read the Vite manifest.json produced by `vite build --manifest`."""
@@ -12,10 +16,7 @@ def _load_manifest():
         return json.load(f)
 
 
-def get_vite_assets():
-    """Return (js_path, css_path) for the main entry point, read from the Vite manifest.
-    Falls back to None values if the manifest is unavailable (e.g., dev mode)."""
-    manifest = _load_manifest()
+def _resolve_assets(manifest):
     if not manifest:
         return None, None
 
@@ -38,3 +39,45 @@ def get_vite_assets():
     js_path = f'/assets/{js_file}' if js_file else None
     css_path = f'/assets/{css_file}' if css_file else None
     return js_path, css_path
+
+
+def _emitted_files(manifest):
+    """Every file the build wrote under a content hash, relative to the output directory."""
+    files = set()
+    for chunk in (manifest or {}).values():
+        if chunk.get('file'):
+            files.add(chunk['file'])
+        files.update(chunk.get('css', []))
+        files.update(chunk.get('assets', []))
+    return frozenset(files)
+
+
+def _manifest_data():
+    manifest_path = os.path.join(current_app.static_folder, '.vite', 'manifest.json')
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    cached = _cache.get(manifest_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _cache_lock:
+        manifest = _load_manifest() if mtime is not None else None
+        data = (_resolve_assets(manifest), _emitted_files(manifest) if manifest else None)
+        _cache[manifest_path] = (mtime, data)
+    return data
+
+
+def get_vite_assets():
+    """Return (js_path, css_path) for the main entry point, read from the Vite manifest.
+    Falls back to None values if the manifest is unavailable (e.g., dev mode).
+    The manifest is parsed once and re-read only when its mtime changes (a rebuild)."""
+    return _manifest_data()[0]
+
+
+def get_hashed_files():
+    """Paths (relative to the static folder) of the content-hashed files of the current
+    build, as listed in its manifest, or None if there is no manifest."""
+    return _manifest_data()[1]
@@ -0,0 +1,197 @@
+"""
+Memory and wall-time harness for the QTI exporter.
+
+Runs create_qti_1_2_package and the zip step used by /api/download over
+synthetic quizzes of each question type and prints one JSON object per
+measurement (JSON Lines), so results can be diffed between commits.
+
+Usage:
+    python scripts/bench_export.py
+    python scripts/bench_export.py --sizes 100 1000 --types multiple_choice_question mixed
+    python scripts/bench_export.py --output bench_output.jsonl
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.exporter import create_qti_1_2_package, package_qti_zip  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+
+# --- Synthetic questions (same shapes the parser produces) ---
+
+def _mcq(i):
+    answers = [{"id": f"q{i}_ans{a}", "text": f"Option {a} for question {i}"} for a in range(4)]
+    return {
+        "id": f"q{i}",
+        "type": "multiple_choice_question",
+        "question_text": f"Which option is correct for question {i}?",
+        "answers": answers,
+        "correct_answer_id": answers[2]["id"],
+        "points": "1",
+    }
+
+def _true_false(i):
+    answers = [{"id": f"q{i}_ans0", "text": "True"}, {"id": f"q{i}_ans1", "text": "False"}]
+    return {
+        "id": f"q{i}",
+        "type": "true_false_question",
+        "question_text": f"Statement number {i} is true.",
+        "answers": answers,
+        "correct_answer_id": answers[0]["id"],
+        "points": "1",
+    }
+
+def _multi_answer(i):
+    answers = [{"id": f"q{i}_ans{a}", "text": f"Choice {a} for question {i}"} for a in range(5)]
+    return {
+        "id": f"q{i}",
+        "type": "multiple_answers_question",
+        "question_text": f"Select every correct choice for question {i}.",
+        "answers": answers,
+        "correct_answer_ids": [answers[0]["id"], answers[3]["id"]],
+        "points": "2",
+    }
+
+def _short_answer(i):
+    return {
+        "id": f"q{i}",
+        "type": "short_answer_question",
+        "question_text": f"What is the answer to question {i}?",
+        "answers": [{"id": f"q{i}_ans0", "text": f"answer{i}"}],
+        "points": "1",
+    }
+
+def _fmb(i):
+    return {
+        "id": f"q{i}",
+        "type": "fill_in_multiple_blanks_question",
+        "question_text": f"The [color] fox jumped over the [animal] in question {i}.",
+        "variables": {"color": ["red", "brown"], "animal": ["dog"]},
+        "points": "2",
+    }
+
+def _essay(i):
+    return {
+        "id": f"q{i}",
+        "type": "essay_question",
+        "question_text": f"Explain the reasoning behind question {i} in detail.",
+        "answers": [],
+        "points": "5",
+    }
+
+BUILDERS = {
+    "multiple_choice_question": _mcq,
+    "true_false_question": _true_false,
+    "multiple_answers_question": _multi_answer,
+    "short_answer_question": _short_answer,
+    "fill_in_multiple_blanks_question": _fmb,
+    "essay_question": _essay,
+}
+
+def build_quiz(q_type, size):
+    """Returns `size` synthetic questions of one type, or a round-robin of all types for 'mixed'."""
+    if q_type == "mixed":
+        builders = list(BUILDERS.values())
+        return [builders[i % len(builders)](i) for i in range(size)]
+    builder = BUILDERS[q_type]
+    return [builder(i) for i in range(size)]
+
+# --- Measurement ---
+
+def _measure_wall(questions, title):
+    """Untraced run so tracemalloc overhead does not distort timings."""
+    gc.collect()
+    start = time.perf_counter()
+    qti_package = create_qti_1_2_package(title, questions)
+    export_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    zip_buffer = package_qti_zip(qti_package)
+    zip_s = time.perf_counter() - start
+    return export_s, zip_s, len(qti_package.encode("utf-8")), zip_buffer.getbuffer().nbytes
+
+def _measure_memory(questions, title):
+    """Traced run: peak bytes allocated by each phase and the bytes each phase leaves reachable."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base_size, _ = tracemalloc.get_traced_memory()
+
+        qti_package = create_qti_1_2_package(title, questions)
+        _, export_peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        export_size, _ = tracemalloc.get_traced_memory()
+
+        tracemalloc.reset_peak()
+        zip_buffer = package_qti_zip(qti_package)
+        _, zip_peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        zip_size, _ = tracemalloc.get_traced_memory()
+        del zip_buffer, qti_package
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "export_peak_bytes": export_peak - base_size,
+        "export_retained_bytes": export_size - base_size,
+        "zip_peak_bytes": zip_peak - export_size,
+        "zip_retained_bytes": zip_size - export_size,
+    }
+
+def run_case(q_type, size):
+    questions = build_quiz(q_type, size)
+    title = f"bench_{q_type}_{size}"
+
+    export_s, zip_s, xml_bytes, zip_bytes = _measure_wall(questions, title)
+    memory = _measure_memory(questions, title)
+
+    return {
+        "question_type": q_type,
+        "questions": size,
+        "export_wall_s": round(export_s, 6),
+        "zip_wall_s": round(zip_s, 6),
+        "xml_bytes": xml_bytes,
+        "zip_bytes": zip_bytes,
+        **memory,
+        "export_peak_bytes_per_question": round(memory["export_peak_bytes"] / size, 1),
+        "zip_peak_bytes_per_question": round(memory["zip_peak_bytes"] / size, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Quiz sizes (question counts) to benchmark.")
+    parser.add_argument("--types", nargs="+", default=list(BUILDERS) + ["mixed"],
+                        choices=list(BUILDERS) + ["mixed"],
+                        help="Question types to benchmark; 'mixed' round-robins every type.")
+    parser.add_argument("--output", help="Write JSON Lines here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        meta = {
+            "record": "meta",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        out.write(json.dumps(meta) + "\n")
+        for q_type in args.types:
+            for size in args.sizes:
+                result = run_case(q_type, size)
+                out.write(json.dumps({"record": "result", **result}) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
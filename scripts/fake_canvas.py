@@ -0,0 +1,299 @@
+"""
+Self-contained stand-in for the parts of the Canvas API this tool talks to.
+
+Implements:
+    POST /api/v1/courses/<course_id>/content_migrations   (with pre_attachment)
+    POST /files_api/upload/<migration_id>                  (302 to a create_success URL, as Canvas does)
+    GET  /api/v1/files/<migration_id>/create_success
+    GET  /api/v1/progress/<migration_id>                   (advances on each poll)
+    POST /login/oauth2/token                               (authorization_code and refresh_token grants)
+
+Latency and failures can be injected so the app's timeouts, retries and
+progress handling can be exercised without a real Canvas instance. Point the
+app at it with CANVAS_DOMAIN=http://127.0.0.1:<port>.
+
+Usage:
+    python scripts/fake_canvas.py --port 8090 --latency 0.2 --upload-latency 2 --error-rate 0.05
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeCanvasState:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.migrations = {}  # migration id -> {"course_id", "uploaded", "polls", "fail"}
+        self.refresh_tokens = {}  # refresh token -> access token
+        self.revoked = set()
+        self.issued = {}  # access token -> monotonic issue time, for --token-ttl expiry
+        self.stats = {"migrations": 0, "uploads": 0, "upload_bytes": 0, "progress_polls": 0, "token_grants": 0, "refresh_grants": 0, "injected_errors": 0}
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeCanvas/1.0'
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{self.headers.get('Host') or f'{host}:{port}'}"
+
+    # --- Plumbing ---
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            # Canvas' upload target (S3) rejects chunked bodies; mirror that
+            return None
+        body = b''
+        while len(body) < length:
+            chunk = self.rfile.read(min(65536, length - len(body)))
+            if not chunk:
+                break
+            body += chunk
+        return body
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        # Rate-limit headers in the shape Canvas sends them
+        self.send_header('X-Request-Cost', f"{random.uniform(0.1, 2.0):.4f}")
+        self.send_header('X-Rate-Limit-Remaining', f"{self.state.args.rate_limit_remaining:.4f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self, seconds):
+        if seconds > 0:
+            time.sleep(random.uniform(seconds * 0.5, seconds * 1.5))
+
+    def _inject_error(self):
+        if random.random() < self.state.args.error_rate:
+            self.state.count('injected_errors')
+            self._send(self.state.args.error_status, {"errors": [{"message": "Injected failure"}]})
+            return True
+        return False
+
+    def _authorized(self):
+        auth = self.headers.get('Authorization', '')
+        token = auth[len('Bearer '):] if auth.startswith('Bearer ') else ''
+        issued = self.state.issued.get(token)
+        expired = issued is not None and time.monotonic() - issued > self.state.args.token_ttl
+        if not token or token == 'expired' or token in self.state.revoked or expired:
+            self._send(401, {"errors": [{"message": "Invalid access token."}]})
+            return False
+        return True
+
+    # --- Routes ---
+
+    def do_POST(self):
+        body = self._read_body()
+        if body is None:
+            self._send(411, {"errors": [{"message": "Length Required"}]})
+            return
+        self._delay(self.state.args.latency)
+
+        match = re.fullmatch(r'/api/v1/courses/([^/]+)/content_migrations', self.path)
+        if match:
+            if self._inject_error() or not self._authorized():
+                return
+            self._create_migration(match.group(1), body)
+            return
+
+        match = re.fullmatch(r'/files_api/upload/(\d+)', self.path)
+        if match:
+            self._delay(self.state.args.upload_latency)
+            if self._inject_error():
+                return
+            self._upload(int(match.group(1)), body)
+            return
+
+        if self.path == '/login/oauth2/token':
+            if self._inject_error():
+                return
+            self._token(body)
+            return
+
+        self._send(404, {"errors": [{"message": "Not found"}]})
+
+    def do_GET(self):
+        self._read_body()
+        self._delay(self.state.args.latency)
+
+        match = re.fullmatch(r'/api/v1/progress/(\d+)', self.path)
+        if match:
+            if self._inject_error() or not self._authorized():
+                return
+            self._progress(int(match.group(1)))
+            return
+
+        match = re.fullmatch(r'/api/v1/files/(\d+)/create_success', self.path)
+        if match:
+            self._send(200, {"id": int(match.group(1)), "upload_status": "success"})
+            return
+
+        if self.path == '/__stats':
+            with self.state.lock:
+                self._send(200, dict(self.state.stats))
+            return
+
+        self._send(404, {"errors": [{"message": "Not found"}]})
+
+    def _create_migration(self, course_id, body):
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            self._send(400, {"errors": [{"message": "Invalid JSON"}]})
+            return
+        if payload.get('migration_type') != 'qti_converter' or 'pre_attachment' not in payload:
+            self._send(400, {"errors": [{"message": "qti_converter migration with pre_attachment required"}]})
+            return
+
+        migration_id = next(self.state.ids)
+        with self.state.lock:
+            self.state.migrations[migration_id] = {
+                "course_id": course_id,
+                "expected_size": payload['pre_attachment'].get('size'),
+                "uploaded": False,
+                "polls": 0,
+                "fail": random.random() < self.state.args.fail_rate,
+            }
+        self.state.count('migrations')
+        self._send(200, {
+            "id": migration_id,
+            "migration_type": "qti_converter",
+            "workflow_state": "pre_processing",
+            "progress_url": f"{self.base_url}/api/v1/progress/{migration_id}",
+            "pre_attachment": {
+                "upload_url": f"{self.base_url}/files_api/upload/{migration_id}",
+                "upload_params": {"key": f"uploads/{migration_id}/{secrets.token_hex(4)}", "success_action_redirect": "1"},
+            },
+        })
+
+    def _upload(self, migration_id, body):
+        with self.state.lock:
+            migration = self.state.migrations.get(migration_id)
+            if migration is not None:
+                migration["uploaded"] = True
+        if migration is None:
+            self._send(404, {"errors": [{"message": "Unknown upload"}]})
+            return
+        if b'filename="' not in body:
+            self._send(400, {"errors": [{"message": "No file part in upload"}]})
+            return
+        self.state.count('uploads')
+        self.state.count('upload_bytes', len(body))
+        self._send(302, None, {"Location": f"{self.base_url}/api/v1/files/{migration_id}/create_success"})
+
+    def _progress(self, migration_id):
+        steps = max(1, self.state.args.progress_steps)
+        with self.state.lock:
+            migration = self.state.migrations.get(migration_id)
+            if migration is not None and migration["uploaded"]:
+                migration["polls"] += 1
+        if migration is None:
+            self._send(404, {"errors": [{"message": "Progress not found"}]})
+            return
+        self.state.count('progress_polls')
+
+        polls = migration["polls"]
+        if not migration["uploaded"]:
+            workflow_state, completion = "queued", 0
+        elif polls >= steps:
+            workflow_state = "failed" if migration["fail"] else "completed"
+            completion = 100
+        else:
+            workflow_state, completion = "running", round(100 * polls / steps, 1)
+        self._send(200, {
+            "id": migration_id,
+            "context_id": migration["course_id"],
+            "tag": "content_migration",
+            "workflow_state": workflow_state,
+            "completion": completion,
+        })
+
+    def _token(self, body):
+        from urllib.parse import parse_qs
+        form = {k: v[0] for k, v in parse_qs(body.decode('utf-8')).items()}
+        grant = form.get('grant_type')
+        if grant == 'authorization_code' and form.get('code'):
+            pass
+        elif grant == 'refresh_token' and form.get('refresh_token') in self.state.refresh_tokens:
+            with self.state.lock:
+                self.state.revoked.add(self.state.refresh_tokens[form['refresh_token']])
+        else:
+            self._send(400, {"error": "invalid_grant"})
+            return
+
+        access_token = secrets.token_hex(16)
+        refresh_token = form.get('refresh_token') or secrets.token_hex(16)
+        with self.state.lock:
+            self.state.refresh_tokens[refresh_token] = access_token
+            self.state.issued[access_token] = time.monotonic()
+        self.state.count('refresh_grants' if grant == 'refresh_token' else 'token_grants')
+        payload = {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "user": {"id": 1, "name": "Load Test"},
+            "expires_in": self.state.args.token_ttl,
+        }
+        if grant == 'authorization_code':
+            payload["refresh_token"] = refresh_token
+        self._send(200, payload)
+
+def build_server(args):
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.state = FakeCanvasState(args)
+    return server
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Canvas API server for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean added latency per request (seconds).")
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="Extra mean latency for file uploads (seconds).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with --error-status.")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of migrations that end in workflow_state=failed.")
+    parser.add_argument("--progress-steps", type=int, default=3, help="Progress polls before a migration completes.")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="Lifetime of issued access tokens (seconds); older ones get 401.")
+    parser.add_argument("--rate-limit-remaining", type=float, default=700.0, help="Value sent in X-Rate-Limit-Remaining.")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = build_server(args)
+    print(f"Fake Canvas listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
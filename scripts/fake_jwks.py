@@ -0,0 +1,123 @@
+"""
+Local stand-in for an LTI platform's public key set (JWKS) endpoint.
+
+Implements:
+    GET  /api/lti/security/jwks   the current key set (the path Canvas uses)
+    POST /__rotate                generates a new signing key; the previous one
+                                  stays published for --keep keys
+    GET  /__sign                  an RS256 JWT signed with the newest key, for
+                                  exercising signature validation
+    GET  /__stats                 how many times the key set has been fetched
+
+Point the LTI config's key_set_url at it (or set CANVAS_DOMAIN and keep the
+canvas.docker placeholder in config.json) to check that launches reuse the
+cached key set and that a rotation triggers exactly one refetch.
+
+Usage:
+    python scripts/fake_jwks.py --port 8091 --latency 0.3
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from jwcrypto import jwk, jwt
+
+class FakeJwksState:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.keys = []
+        self.stats = {"jwks_fetches": 0, "rotations": 0}
+        self.rotate()
+
+    def rotate(self):
+        key = jwk.JWK.generate(kty='RSA', size=2048, kid=uuid.uuid4().hex, alg='RS256', use='sig')
+        with self.lock:
+            self.keys = ([key] + self.keys)[:max(1, self.args.keep)]
+            self.stats["rotations"] += 1
+        return key.key_id
+
+    def document(self):
+        with self.lock:
+            return {"keys": [json.loads(key.export_public()) for key in self.keys]}
+
+    def sign(self, claims):
+        with self.lock:
+            key = self.keys[0]
+        token = jwt.JWT(header={"alg": "RS256", "kid": key.key_id}, claims=claims)
+        token.make_signed_token(key)
+        return token.serialize()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeJwks/1.0'
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/api/lti/security/jwks':
+            if self.state.args.latency:
+                time.sleep(self.state.args.latency)
+            with self.state.lock:
+                self.state.stats["jwks_fetches"] += 1
+            return self._json(200, self.state.document())
+        if path == '/__sign':
+            now = int(time.time())
+            return self._json(200, {"id_token": self.state.sign({"iss": self.state.args.issuer, "iat": now, "exp": now + 300})})
+        if path == '/__stats':
+            with self.state.lock:
+                return self._json(200, dict(self.state.stats))
+        self._json(404, {"errors": [{"message": "Not found"}]})
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0] == '/__rotate':
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            return self._json(200, {"kid": self.state.rotate()})
+        self._json(404, {"errors": [{"message": "Not found"}]})
+
+def build_server(args):
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.state = FakeJwksState(args)
+    return server
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake LTI platform JWKS endpoint for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--issuer", default="https://canvas.instructure.com")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per JWKS fetch (seconds).")
+    parser.add_argument("--keep", type=int, default=2, help="Keys kept published after a rotation.")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = build_server(args)
+    print(f"Fake JWKS listening on http://{args.host}:{server.server_port}/api/lti/security/jwks")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Minimal in-memory server speaking the Redis protocol (RESP2, or RESP3 after
+HELLO 3), enough for Flask-Caching's RedisCache: GET/MGET/SET (EX/PX/NX/XX),
+SETNX/EXPIRE/TTL, DEL/UNLINK/EXISTS/KEYS, INCRBY/DECRBY, FLUSHDB and the
+connection handshake (HELLO, CLIENT, SELECT, PING). Lets CACHE_BACKEND=redis be
+exercised with several workers without installing a Redis server. Not durable
+and not for production.
+
+Usage:
+    python scripts/fake_redis.py --port 6390
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0 gunicorn main:app --workers 4
+"""
+import argparse
+import fnmatch
+import socketserver
+import threading
+import time
+
+class FakeRedisState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}  # key -> (value bytes, expires_at monotonic or None)
+        self.commands = 0
+
+    def _live(self, key, now):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self.data[key]
+            return None
+        return entry
+
+class ProtocolError(Exception):
+    pass
+
+def _encode(value, resp3=False):
+    if isinstance(value, dict):
+        # RESP3 map; RESP2 clients get the same pairs as a flat array
+        if resp3:
+            return b'%%%d\r\n' % len(value) + b''.join(_encode(k, resp3) + _encode(v, resp3) for k, v in value.items())
+        return _encode([item for pair in value.items() for item in pair])
+    if value is None:
+        return b'_\r\n' if resp3 else b'$-1\r\n'
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return b'+' + value.encode('utf-8') + b'\r\n'
+    if isinstance(value, Exception):
+        return b'-ERR ' + str(value).encode('utf-8') + b'\r\n'
+    if isinstance(value, (list, tuple)):
+        return b'*%d\r\n' % len(value) + b''.join(_encode(item, resp3) for item in value)
+    return b'$%d\r\n' % len(value) + bytes(value) + b'\r\n'
+
+class Handler(socketserver.StreamRequestHandler):
+    resp3 = False
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.strip().split()  # inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:])):
+            header = self.rfile.readline()
+            if not header.startswith(b'$'):
+                raise ProtocolError("expected bulk string")
+            size = int(header[1:])
+            args.append(self.rfile.read(size + 2)[:size])
+        return args
+
+    def handle(self):
+        state = self.server.state
+        while True:
+            try:
+                command = self._read_command()
+            except (ProtocolError, ValueError):
+                self.wfile.write(_encode(ProtocolError("Protocol error")))
+                return
+            if command is None:
+                return
+            if not command:
+                continue
+            name = command[0].decode('utf-8', 'replace').upper()
+            if name == 'QUIT':
+                self.wfile.write(_encode('OK'))
+                return
+            handler = getattr(self, 'cmd_' + name.lower(), None)
+            with state.lock:
+                state.commands += 1
+                try:
+                    reply = handler(state, time.monotonic(), *command[1:]) if handler else \
+                        Exception(f"unknown command '{name}'")
+                except (TypeError, ValueError) as e:
+                    reply = Exception(f"wrong arguments for '{name}': {e}")
+            self.wfile.write(_encode(reply, self.resp3))
+            self.wfile.flush()
+
+    # --- Connection ---
+
+    def cmd_ping(self, state, now, message=None):
+        return message if message is not None else 'PONG'
+
+    def cmd_hello(self, state, now, protover=b'2', *args):
+        # redis-py 5+ negotiates RESP3 on connect
+        self.resp3 = int(protover) >= 3
+        return {'server': 'redis', 'version': '7.0.0', 'proto': int(protover), 'mode': 'standalone', 'role': 'master'}
+
+    def cmd_select(self, state, now, db):
+        return 'OK'
+
+    def cmd_client(self, state, now, *args):
+        return 'OK'
+
+    def cmd_info(self, state, now, *args):
+        return b'# Server\r\nredis_version:7.0.0-fake\r\n'
+
+    # --- Strings ---
+
+    def cmd_get(self, state, now, key):
+        entry = state._live(key, now)
+        return entry[0] if entry else None
+
+    def cmd_mget(self, state, now, *keys):
+        return [self.cmd_get(state, now, key) for key in keys]
+
+    def cmd_set(self, state, now, key, value, *options):
+        expires_at, only_new, only_existing = None, False, False
+        options = [option.upper() for option in options]
+        i = 0
+        while i < len(options):
+            if options[i] == b'EX':
+                expires_at = now + int(options[i + 1])
+                i += 1
+            elif options[i] == b'PX':
+                expires_at = now + int(options[i + 1]) / 1000.0
+                i += 1
+            elif options[i] == b'NX':
+                only_new = True
+            elif options[i] == b'XX':
+                only_existing = True
+            i += 1
+        exists = state._live(key, now) is not None
+        if (only_new and exists) or (only_existing and not exists):
+            return None
+        state.data[key] = (value, expires_at)
+        return 'OK'
+
+    def cmd_setex(self, state, now, key, seconds, value):
+        return self.cmd_set(state, now, key, value, b'EX', seconds)
+
+    def cmd_setnx(self, state, now, key, value):
+        return self.cmd_set(state, now, key, value, b'NX') is not None
+
+    def cmd_incrby(self, state, now, key, amount=b'1'):
+        entry = state._live(key, now)
+        value = int(entry[0] if entry else 0) + int(amount)
+        state.data[key] = (str(value).encode('ascii'), entry[1] if entry else None)
+        return value
+
+    def cmd_incr(self, state, now, key):
+        return self.cmd_incrby(state, now, key)
+
+    def cmd_decrby(self, state, now, key, amount):
+        return self.cmd_incrby(state, now, key, b'-' + amount)
+
+    # --- Keys ---
+
+    def cmd_del(self, state, now, *keys):
+        return sum(1 for key in keys if state._live(key, now) is not None and state.data.pop(key))
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, state, now, *keys):
+        return sum(1 for key in keys if state._live(key, now) is not None)
+
+    def cmd_expire(self, state, now, key, seconds):
+        entry = state._live(key, now)
+        if entry is None:
+            return 0
+        state.data[key] = (entry[0], now + int(seconds))
+        return 1
+
+    def cmd_ttl(self, state, now, key):
+        entry = state._live(key, now)
+        if entry is None:
+            return -2
+        return -1 if entry[1] is None else int(entry[1] - now)
+
+    def cmd_keys(self, state, now, pattern):
+        pattern = pattern.decode('utf-8', 'replace')
+        return [key for key in list(state.data) if state._live(key, now) is not None
+                and fnmatch.fnmatchcase(key.decode('utf-8', 'replace'), pattern)]
+
+    def cmd_dbsize(self, state, now):
+        return sum(1 for key in list(state.data) if state._live(key, now) is not None)
+
+    def cmd_flushdb(self, state, now, *args):
+        state.data.clear()
+        return 'OK'
+
+    cmd_flushall = cmd_flushdb
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def build_server(args):
+    server = FakeRedisServer((args.host, args.port), Handler)
+    server.state = FakeRedisState()
+    return server
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="In-memory Redis protocol stand-in for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = build_server(args)
+    print(f"Fake Redis listening on redis://{args.host}:{server.server_address[1]}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
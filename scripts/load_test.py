@@ -0,0 +1,199 @@
+"""
+Concurrent load test for the preview, download and Canvas push flows.
+
+Drives a running app (e.g. `gunicorn main:app` or `python main.py`) whose
+CANVAS_DOMAIN points at scripts/fake_canvas.py. Each virtual user first
+completes the OAuth callback against the fake Canvas to obtain a session, then
+repeatedly picks a flow according to --mix. FLASK_ENV=development keeps the
+session cookie usable over plain http. Prints a JSON report with
+throughput and p50/p95/p99 latency per operation.
+
+Usage:
+    python scripts/fake_canvas.py --port 8090 --upload-latency 1 &
+    CANVAS_DOMAIN=http://127.0.0.1:8090 FLASK_ENV=development gunicorn main:app --bind 127.0.0.1:5000 --threads 8 &
+    python scripts/load_test.py --base-url http://127.0.0.1:5000 --users 16 --duration 60 --mix preview=5,download=3,canvas=1
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import defaultdict
+import requests
+
+DEFAULT_QUIZ = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Tests', 'Test.txt')
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)  # operation -> [seconds]
+        self.errors = defaultdict(int)
+
+    def record(self, operation, seconds, ok=True):
+        with self.lock:
+            self.samples[operation].append(seconds)
+            if not ok:
+                self.errors[operation] += 1
+
+    def timed(self, operation, fn):
+        start = time.perf_counter()
+        try:
+            response = fn()
+        except requests.exceptions.RequestException:
+            self.record(operation, time.perf_counter() - start, ok=False)
+            raise
+        self.record(operation, time.perf_counter() - start, ok=response.status_code < 400)
+        return response
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class VirtualUser:
+    def __init__(self, args, recorder, quiz_text, user_id):
+        self.args = args
+        self.recorder = recorder
+        self.quiz_text = quiz_text
+        self.course_id = str(1000 + user_id)
+        self.http = requests.Session()
+        self.base = args.base_url.rstrip('/')
+
+    def _url(self, path):
+        return f"{self.base}{path}"
+
+    def login(self):
+        # Completes the OAuth callback; the app exchanges the code with the fake Canvas
+        res = self.recorder.timed('oauth_callback', lambda: self.http.get(
+            self._url('/api/auth/callback'),
+            params={'code': f'load-{self.course_id}', 'state': self.course_id},
+            allow_redirects=False, timeout=self.args.timeout,
+        ))
+        return res.status_code in (301, 302, 303)
+
+    def preview(self):
+        self.recorder.timed('preview', lambda: self.http.post(
+            self._url('/api/preview'), json={'quiz_text': self.quiz_text}, timeout=self.args.timeout))
+
+    def download(self):
+        self.recorder.timed('download', lambda: self.http.post(
+            self._url('/api/download'), json={'quiz_title': 'Load Test', 'quiz_text': self.quiz_text}, timeout=self.args.timeout))
+
+    def canvas(self):
+        """Full push: enqueue, wait for the job, then poll Canvas progress to a terminal state."""
+        start = time.perf_counter()
+        ok = False
+        try:
+            res = self.recorder.timed('canvas_submit', lambda: self.http.post(
+                self._url('/api/canvas'),
+                # A fresh title per flow, or /api/canvas would replay the first job (idempotency key)
+                json={'quiz_title': f'Load Test {secrets.token_hex(4)}', 'quiz_text': self.quiz_text,
+                      'course_id': self.course_id},
+                timeout=self.args.timeout,
+            ))
+            if res.status_code >= 400:
+                return
+            payload = res.json()
+            progress_url = payload.get('progress_url')
+            deadline = time.monotonic() + self.args.flow_timeout
+
+            while not progress_url and payload.get('job_id') and time.monotonic() < deadline:
+                time.sleep(self.args.poll_interval)
+                job = self.recorder.timed('job_status', lambda: self.http.get(
+                    self._url(f"/api/jobs/{payload['job_id']}"), timeout=self.args.timeout)).json()
+                if job.get('status') == 'failed':
+                    return
+                if job.get('status') == 'succeeded':
+                    progress_url = (job.get('result') or {}).get('progress_url')
+                    break
+
+            while progress_url and time.monotonic() < deadline:
+                state = self.recorder.timed('proxy_progress', lambda: self.http.get(
+                    self._url('/api/proxy/progress'), params={'url': progress_url}, timeout=self.args.timeout)).json()
+                if state.get('workflow_state') in ('completed', 'failed'):
+                    ok = state['workflow_state'] == 'completed'
+                    return
+                time.sleep(self.args.poll_interval)
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+        finally:
+            self.recorder.record('canvas_flow', time.perf_counter() - start, ok=ok)
+
+    def run(self, flows, weights, stop_at):
+        if 'canvas' in flows and not self.login():
+            flows, weights = [f for f in flows if f != 'canvas'], [w for f, w in zip(flows, weights) if f != 'canvas']
+        while time.monotonic() < stop_at and flows:
+            flow = random.choices(flows, weights=weights)[0]
+            try:
+                getattr(self, flow)()
+            except requests.exceptions.RequestException:
+                pass
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('preview', 'download', 'canvas'):
+            raise argparse.ArgumentTypeError(f"Unknown flow '{name}'")
+        mix[name] = float(weight or 1)
+    return mix
+
+def build_report(recorder, elapsed, users):
+    report = {"users": users, "duration_s": round(elapsed, 3), "operations": {}}
+    for operation, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        report["operations"][operation] = {
+            "count": len(ordered),
+            "errors": recorder.errors[operation],
+            "throughput_rps": round(len(ordered) / elapsed, 3) if elapsed else None,
+            "mean_ms": round(1000 * sum(ordered) / len(ordered), 2),
+            "p50_ms": round(1000 * percentile(ordered, 50), 2),
+            "p95_ms": round(1000 * percentile(ordered, 95), 2),
+            "p99_ms": round(1000 * percentile(ordered, 99), 2),
+            "max_ms": round(1000 * ordered[-1], 2),
+        }
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the quiz converter.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=30, help="Test length in seconds.")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("preview=5,download=3,canvas=1"),
+                        help="Weighted flows, e.g. preview=5,download=3,canvas=1")
+    parser.add_argument("--quiz", default=DEFAULT_QUIZ, help="Quiz text file used as the request payload.")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the quiz text N times to grow the payload.")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--flow-timeout", type=float, default=120, help="Give up on a Canvas flow after this long.")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--output", help="Write the JSON report here as well as stdout.")
+    args = parser.parse_args(argv)
+
+    with open(args.quiz, encoding='utf-8') as f:
+        quiz_text = "\n\n".join([f.read().strip()] * args.repeat)
+
+    flows, weights = list(args.mix), list(args.mix.values())
+    recorder = Recorder()
+    start = time.monotonic()
+    stop_at = start + args.duration
+    users = [VirtualUser(args, recorder, quiz_text, i) for i in range(args.users)]
+    threads = [threading.Thread(target=u.run, args=(flows, weights, stop_at), daemon=True) for u in users]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = build_report(recorder, time.monotonic() - start, args.users)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
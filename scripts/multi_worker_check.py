@@ -0,0 +1,201 @@
+"""
+End-to-end check that LTI launches work when the app runs with several
+gunicorn workers, i.e. that the configured CACHE_BACKEND is really shared.
+
+The script plays the platform: it starts scripts/fake_jwks.py in-process,
+writes a throwaway tool config (keys + config.json) pointing at it, boots
+gunicorn with --workers N and LTI_CONFIG_DIR set to that config, then runs
+full OIDC login -> launch round trips. The login stores state and nonce in the
+cache from whichever worker receives it; the launch (very likely another
+worker) must find them. With CACHE_BACKEND=redis and no --redis-url, a
+scripts/fake_redis.py stand-in is started as well.
+
+Prints a JSON report and exits non-zero if any launch failed, so
+`--backend simple --workers 4` demonstrates the failure this guards against.
+
+Usage:
+    python scripts/multi_worker_check.py --backend redis --workers 4 --launches 40
+    python scripts/multi_worker_check.py --backend filesystem --workers 4
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_jwks  # noqa: E402
+import fake_redis  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_ID = 'multi-worker-check'
+DEPLOYMENT_ID = '1:multi-worker-check'
+LTI_CLAIM = 'https://purl.imsglobal.org/spec/lti/claim/'
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def write_tool_config(config_dir, platform_url):
+    """Writes a tool key pair and a config.json that trusts the fake platform."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with open(os.path.join(config_dir, 'private.key'), 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open(os.path.join(config_dir, 'public.key'), 'wb') as f:
+        f.write(key.public_key().public_bytes(serialization.Encoding.PEM,
+                                              serialization.PublicFormat.SubjectPublicKeyInfo))
+    config = {platform_url: [{
+        "default": True,
+        "client_id": CLIENT_ID,
+        "auth_login_url": f"{platform_url}/api/lti/authorize_redirect",
+        "auth_token_url": f"{platform_url}/login/oauth2/token",
+        "key_set_url": f"{platform_url}/api/lti/security/jwks",
+        "key_set": None,
+        "private_key_file": "private.key",
+        "public_key_file": "public.key",
+        "deployment_ids": [DEPLOYMENT_ID],
+    }]}
+    with open(os.path.join(config_dir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+
+def start_app(args, env):
+    command = [sys.executable, '-m', 'gunicorn', 'main:app', '--bind', f'127.0.0.1:{args.port}',
+               '--workers', str(args.workers), '--threads', str(args.threads)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL if not args.verbose else None,
+                               stderr=subprocess.DEVNULL if not args.verbose else None)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            requests.get(f'http://127.0.0.1:{args.port}/jwks/', timeout=1)
+            return process
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start in time")
+
+def launch_once(app_url, platform, platform_url, index):
+    """One OIDC login + launch. Returns None on success or a short error description."""
+    http = requests.Session()
+    # A fresh connection per step, as behind a load balancer; keep-alive would pin both to one worker
+    http.headers['Connection'] = 'close'
+    login = http.get(f'{app_url}/login/', params={
+        'iss': platform_url,
+        'client_id': CLIENT_ID,
+        'login_hint': f'user-{index}',
+        'lti_message_hint': f'message-{index}',
+        'target_link_uri': f'{app_url}/launch/',
+    }, allow_redirects=False, timeout=10)
+    if login.status_code not in (301, 302, 303):
+        return f"login returned {login.status_code}"
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(login.headers['Location']).query)
+
+    now = int(time.time())
+    id_token = platform.sign({
+        'iss': platform_url,
+        'aud': CLIENT_ID,
+        'sub': f'user-{index}',
+        'iat': now,
+        'exp': now + 300,
+        'nonce': query['nonce'][0],
+        LTI_CLAIM + 'deployment_id': DEPLOYMENT_ID,
+        LTI_CLAIM + 'message_type': 'LtiResourceLinkRequest',
+        LTI_CLAIM + 'version': '1.3.0',
+        LTI_CLAIM + 'target_link_uri': f'{app_url}/launch/',
+        LTI_CLAIM + 'resource_link': {'id': f'link-{index}'},
+        LTI_CLAIM + 'roles': ['http://purl.imsglobal.org/vocab/lis/v2/membership#Instructor'],
+        LTI_CLAIM + 'custom': {'canvas_course_id': str(1000 + index)},
+    })
+    launch = http.post(f'{app_url}/launch/', data={'id_token': id_token, 'state': query['state'][0]},
+                       allow_redirects=False, timeout=10)
+    # Without a Canvas API token yet, a valid launch redirects to the OAuth flow
+    if launch.status_code in (301, 302, 303) and launch.headers.get('Location', '').endswith('/api/auth/canvas'):
+        return None
+    return f"launch returned {launch.status_code}: {launch.text[:200]}"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verify LTI launches across several gunicorn workers.")
+    parser.add_argument("--backend", choices=('simple', 'filesystem', 'redis'), default='redis')
+    parser.add_argument("--redis-url", help="Use this Redis instead of starting the fake one.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--launches", type=int, default=40)
+    parser.add_argument("--port", type=int, default=0, help="App port (default: a free port).")
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.port = args.port or _free_port()
+    app_url = f'http://127.0.0.1:{args.port}'
+
+    platform_server = _serve(fake_jwks.build_server(fake_jwks.parse_args(['--port', '0'])))
+    platform_url = f'http://127.0.0.1:{platform_server.server_port}'
+
+    with tempfile.TemporaryDirectory(prefix='multi-worker-') as workdir:
+        config_dir = os.path.join(workdir, 'config')
+        os.makedirs(config_dir)
+        write_tool_config(config_dir, platform_url)
+
+        env = dict(os.environ, CACHE_BACKEND=args.backend, LTI_CONFIG_DIR=config_dir,
+                   FLASK_ENV='development', SECRET_KEY=uuid.uuid4().hex, JOB_BACKEND='inline')
+        if args.backend == 'filesystem':
+            env['CACHE_DIR'] = os.path.join(workdir, 'cache')
+        elif args.backend == 'redis':
+            if args.redis_url:
+                env['CACHE_REDIS_URL'] = args.redis_url
+            else:
+                redis_server = _serve(fake_redis.build_server(fake_redis.parse_args(['--port', '0'])))
+                env['CACHE_REDIS_URL'] = f'redis://127.0.0.1:{redis_server.server_address[1]}/0'
+        env.pop('LTI_PRIVATE_KEY', None)
+
+        process = start_app(args, env)
+        try:
+            errors = []
+            start = time.monotonic()
+            for index in range(args.launches):
+                try:
+                    error = launch_once(app_url, platform_server.state, platform_url, index)
+                except requests.exceptions.RequestException as e:
+                    error = f"request failed: {e}"
+                if error:
+                    errors.append(error)
+            elapsed = time.monotonic() - start
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = {
+        "backend": args.backend,
+        "workers": args.workers,
+        "launches": args.launches,
+        "succeeded": args.launches - len(errors),
+        "failed": len(errors),
+        "mean_ms": round(1000 * elapsed / max(1, args.launches), 2),
+        "jwks_fetches": platform_server.state.stats["jwks_fetches"],
+        "sample_errors": errors[:5],
+    }
+    print(json.dumps(report, indent=2))
+    platform_server.shutdown()
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
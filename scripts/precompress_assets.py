@@ -0,0 +1,37 @@
+"""
+Writes gzip (and, if the brotli package is installed, brotli) variants next to
+the built frontend assets so /assets can serve them without compressing at
+request time. Run after `npm run build`; files the app finds missing or stale
+are compressed on first request instead.
+
+Usage:
+    python scripts/precompress_assets.py [--dir app/assets]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from app.utils.static_assets import available_encodings, compress_file, is_compressible  # noqa: E402
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompress built frontend assets.")
+    parser.add_argument("--dir", default=os.path.join(ROOT, 'app', 'assets'))
+    args = parser.parse_args(argv)
+
+    suffixes = tuple(suffix for _, suffix in available_encodings())
+    written = 0
+    for dirpath, _, filenames in os.walk(args.dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if filename.endswith(('.gz', '.br')) or not is_compressible(path):
+                continue
+            for encoding, suffix in available_encodings():
+                compress_file(path, encoding, path + suffix)
+                print(f"{os.path.relpath(path + suffix, args.dir)}  {os.path.getsize(path)} -> {os.path.getsize(path + suffix)} bytes")
+                written += 1
+    print(f"Wrote {written} variants ({', '.join(suffixes)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Prints an X-Profile-Token header value that asks the app to profile one request,
+signed with PROFILE_ADMIN_SECRET. Tokens are bound to the method and path and
+expire after PROFILE_TOKEN_MAX_AGE seconds (default 300).
+
+Usage:
+    python scripts/profile_token.py POST /api/preview
+    curl -H "X-Profile-Token: $(python scripts/profile_token.py POST /api/download)" ...
+
+The profile and its metadata land in PROFILE_DIR; inspect with `python -m pstats <file>.prof`.
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from app.utils.profiling import sign  # noqa: E402
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sign a request for on-demand profiling.")
+    parser.add_argument("method")
+    parser.add_argument("path")
+    parser.add_argument("--secret", default=os.getenv('PROFILE_ADMIN_SECRET'),
+                        help="Defaults to $PROFILE_ADMIN_SECRET.")
+    args = parser.parse_args(argv)
+    if not args.secret:
+        parser.error("PROFILE_ADMIN_SECRET is not set")
+    print(sign(args.secret, args.method, args.path))
+
+if __name__ == "__main__":
+    main()